@@ -0,0 +1,458 @@
+import atexit
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+from rules import (BEAUTY_KEYWORDS, EXAGGERATION_KEYWORDS, GUARANTEE_KEYWORDS, MEDICAL_KEYWORDS,
+                   PATTERN_CATEGORIES)
+
+# ==============================================================================
+# 🗄️ AUDIT STORE (เก็บผลตรวจทุกครั้งไว้ทำรายงานย้อนหลัง)
+# ==============================================================================
+# 1. บันทึกดิบ (Append-only): audit_data/YYYY-MM-DD.ndjson.gz
+#    - 1 บรรทัด = 1 การตรวจ, ทุกบรรทัดมีคีย์ชุดเดียวกัน (แปลงเป็นตาราง/Parquet ได้ตรงๆ)
+#    - เขียนเพิ่มท้ายไฟล์ทีละก้อนเป็น gzip member ใหม่ (gzip อ่านต่อกันได้ทั้งไฟล์) ไม่แก้ของเก่า
+# 2. ตารางสรุปรายวัน (Rollup): audit_data/rollup.sqlite3
+#    - อัปเดตพร้อมกันตอนเขียนแต่ละก้อน (บวกยอดเข้าแถวของวันนั้น)
+#    - คำถามอย่าง "เดือนนี้กฎไหนโดนบ่อยสุด" อ่านแค่ วัน x กฎ (หรือ วัน x โดเมน x กฎ) ไม่ต้องไล่อ่านทุกบันทึก
+#      จำนวนแถวจึงไม่โตตามจำนวนการตรวจ (หลักสิบล้านก็ยังตอบได้ทันที)
+#    - ถ้าไฟล์นี้หาย/เสีย สร้างใหม่จากบันทึกดิบได้ (python audit.py rebuild)
+#
+# กฎถูกบันทึกด้วย "คำในฐานข้อมูล" (เช่น "หายขาด", "INS-01") ไม่ใช่เลข id
+# เพราะเลข id เปลี่ยนได้เมื่อแก้ rules.json
+
+AUDIT_DIR = os.environ.get("AUDIT_DIR", "audit_data")
+AUDIT_ENABLED = os.environ.get("AUDIT_ENABLED", "1") != "0"
+AUDIT_FLUSH_EVERY = int(os.environ.get("AUDIT_FLUSH_EVERY", "200"))        # บันทึกลงไฟล์ทุกกี่รายการ
+AUDIT_FLUSH_SECONDS = float(os.environ.get("AUDIT_FLUSH_SECONDS", "10"))   # หรือทุกกี่วินาที
+
+GROUP_BY = ("rule", "category", "domain", "day")
+
+_buffer: list[dict] = []
+_buffer_lock = threading.Lock()
+_write_lock = threading.Lock()
+_wake = threading.Event()
+_flusher = None
+_schema_ready = False
+
+
+def _rollup_path() -> str:
+    return os.path.join(AUDIT_DIR, "rollup.sqlite3")
+
+
+def _segment_path(day: str) -> str:
+    return os.path.join(AUDIT_DIR, f"{day}.ndjson.gz")
+
+
+def rule_category(keyword: str) -> str:
+    """หมวดของกฎ (ใช้จัดกลุ่มในรายงาน)"""
+    if keyword in GUARANTEE_KEYWORDS:
+        return "guarantee"
+    if keyword in MEDICAL_KEYWORDS:
+        return "medical"
+    if keyword in EXAGGERATION_KEYWORDS:
+        return "exaggeration"
+    if keyword in BEAUTY_KEYWORDS:
+        return "beauty"
+    if keyword in PATTERN_CATEGORIES:
+        return PATTERN_CATEGORIES[keyword]
+    return "insurance"  # กฎจาก rules.json (INS-xx)
+
+
+# ==============================================================================
+# 📝 1. บันทึกผลตรวจ
+# ==============================================================================
+
+def record(text: str, bad_sentences, stats: dict, url: str | None = None, rulebooks=None):
+    """
+    บันทึกผลตรวจ 1 ครั้ง (เก็บเข้า buffer ก่อน แล้วเธรดพื้นหลังค่อยเขียนลงไฟล์เป็นก้อน)
+    ไม่เก็บตัวข้อความ เก็บแค่ hash (ข้อความเดิมซ้ำ = hash เดิม)
+    """
+    if not AUDIT_ENABLED:
+        return
+
+    counts = Counter()
+    for item in bad_sentences:
+        counts.update(item.keywords)
+
+    now = datetime.now(timezone.utc)
+    entry = {
+        "ts": now.isoformat(timespec="seconds"),
+        "day": now.date().isoformat(),
+        "source": "url" if url else "text",
+        "url": url or "",
+        "domain": (urlsplit(url if "://" in url else "https://" + url).hostname or "") if url else "",
+        "text_hash": hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest(),
+        "rulebooks": sorted(rulebooks) if rulebooks else [],
+        "score": stats["score"],
+        "total": stats["total"],
+        "risk": stats["risk"],
+        "violation": stats["violation"],
+        "rules": list(counts),
+        "rule_counts": list(counts.values()),
+    }
+
+    global _flusher
+    with _buffer_lock:
+        _buffer.append(entry)
+        due = len(_buffer) >= AUDIT_FLUSH_EVERY
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="audit-flusher", daemon=True)
+            _flusher.start()
+    if due:
+        _wake.set()  # ให้เธรดพื้นหลังเขียน (คำขอไม่ต้องรอเขียนไฟล์/SQLite)
+
+
+def _flush_loop():
+    """เธรดพื้นหลัง: เขียนทุก AUDIT_FLUSH_EVERY รายการ หรือทุก AUDIT_FLUSH_SECONDS วินาที"""
+    while True:
+        _wake.wait(AUDIT_FLUSH_SECONDS)
+        _wake.clear()
+        try:
+            flush()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ บันทึก audit ไม่สำเร็จ: {e}")
+
+
+def flush():
+    """เขียน buffer ลงบันทึกดิบ แล้วบวกยอดเข้าตารางสรุป"""
+    with _buffer_lock:
+        entries = _buffer[:]
+        _buffer.clear()
+    if not entries:
+        return
+
+    # เปิดฐานข้อมูลก่อนเขียนบันทึกดิบ: การอัปเกรดครั้งแรก (_migrate) เติมยอดจากบันทึกดิบ
+    # ถ้าเขียน buffer ลงไฟล์ก่อน ยอดชุดนี้จะถูกนับซ้ำ
+    with _write_lock, _db() as conn:
+        by_day = {}
+        for entry in entries:
+            by_day.setdefault(entry["day"], []).append(entry)
+        for day, day_entries in by_day.items():
+            lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in day_entries)
+            # บีบอัดทั้งก้อนในหน่วยความจำ แล้วเขียนต่อท้ายไฟล์ด้วย write ครั้งเดียว
+            with open(_segment_path(day), "ab") as f:
+                f.write(gzip.compress(lines.encode("utf-8")))
+        _apply_rollup(conn, entries)
+
+
+atexit.register(flush)
+
+
+# ==============================================================================
+# 📊 2. ตารางสรุปรายวัน (SQLite Rollup)
+# ==============================================================================
+
+@contextmanager
+def _db():
+    """เปิดฐานข้อมูลสรุป (commit เมื่อจบบล็อกโดยไม่มี error แล้วปิดทุกครั้ง)"""
+    global _schema_ready
+    os.makedirs(AUDIT_DIR, exist_ok=True)
+    conn = sqlite3.connect(_rollup_path(), timeout=30)
+    try:
+        if not _schema_ready:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS check_daily (
+                    day TEXT NOT NULL, domain TEXT NOT NULL,
+                    checks INTEGER NOT NULL, score_sum INTEGER NOT NULL,
+                    violation_checks INTEGER NOT NULL, risk_checks INTEGER NOT NULL,
+                    PRIMARY KEY (day, domain)
+                );
+                CREATE TABLE IF NOT EXISTS rule_daily (
+                    day TEXT NOT NULL, rule TEXT NOT NULL, category TEXT NOT NULL,
+                    hits INTEGER NOT NULL, checks INTEGER NOT NULL,
+                    PRIMARY KEY (day, rule)
+                );
+                CREATE TABLE IF NOT EXISTS rule_domain_daily (
+                    day TEXT NOT NULL, domain TEXT NOT NULL, rule TEXT NOT NULL, category TEXT NOT NULL,
+                    hits INTEGER NOT NULL, checks INTEGER NOT NULL,
+                    PRIMARY KEY (day, domain, rule)
+                );
+                CREATE TABLE IF NOT EXISTS category_daily (
+                    day TEXT NOT NULL, category TEXT NOT NULL,
+                    hits INTEGER NOT NULL, checks INTEGER NOT NULL,
+                    PRIMARY KEY (day, category)
+                );
+                CREATE TABLE IF NOT EXISTS category_domain_daily (
+                    day TEXT NOT NULL, domain TEXT NOT NULL, category TEXT NOT NULL,
+                    hits INTEGER NOT NULL, checks INTEGER NOT NULL,
+                    PRIMARY KEY (day, domain, category)
+                );
+                CREATE INDEX IF NOT EXISTS idx_check_domain ON check_daily (domain, day);
+                CREATE INDEX IF NOT EXISTS idx_rule_rule ON rule_daily (rule, day);
+                CREATE INDEX IF NOT EXISTS idx_rule_domain ON rule_domain_daily (domain, day);
+                CREATE INDEX IF NOT EXISTS idx_category_domain ON category_domain_daily (domain, day);
+            """)
+            _migrate(conn)
+            _schema_ready = True
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _migrate(conn: sqlite3.Connection):
+    """
+    อัปเกรดฐานข้อมูลจากเวอร์ชันก่อน (ทำครั้งเดียว ดูจาก PRAGMA user_version)
+    1: เพิ่มตารางสรุปตามหมวด (เติมย้อนหลังจากบันทึกดิบ) + เปลี่ยนหมวด "pattern" เป็นหมวดจริง
+    """
+    conn.execute("BEGIN IMMEDIATE")  # กันหลาย process อัปเกรดซ้ำพร้อมกัน
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            if conn.execute("SELECT 1 FROM check_daily LIMIT 1").fetchone():
+                for keyword in PATTERN_CATEGORIES:
+                    for table in ("rule_daily", "rule_domain_daily"):
+                        conn.execute(f"UPDATE {table} SET category = ? WHERE rule = ?",
+                                     (rule_category(keyword), keyword))
+                chunk = []
+                for entry in iter_records():
+                    chunk.append(entry)
+                    if len(chunk) >= 10000:
+                        _apply_category_rollup(conn, chunk)
+                        chunk = []
+                _apply_category_rollup(conn, chunk)
+            conn.execute("PRAGMA user_version = 1")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _apply_category_rollup(conn: sqlite3.Connection, entries):
+    """
+    ยอดตามหมวด: 1 การตรวจนับ checks ครั้งเดียวต่อหมวด (แม้โดนหลายกฎในหมวดเดียวกัน เช่น ดีที่สุด + ที่สุด)
+    จึงต้องนับจากบันทึกแต่ละรายการ ไม่ใช่บวก rule_daily.checks ของทุกกฎในหมวด
+    """
+    categories = {}
+    for e in entries:
+        hits_by_category = Counter()
+        for rule, count in zip(e["rules"], e["rule_counts"]):
+            hits_by_category[rule_category(rule)] += count
+        for category, hits in hits_by_category.items():
+            row = categories.setdefault((e["day"], e["domain"], category), [0, 0])
+            row[0] += hits
+            row[1] += 1
+
+    conn.executemany("""
+        INSERT INTO category_domain_daily VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (day, domain, category) DO UPDATE SET
+            hits = hits + excluded.hits, checks = checks + excluded.checks
+    """, [(*key, *row) for key, row in categories.items()])
+
+    totals = {}
+    for (day, _, category), (hits, category_checks) in categories.items():
+        row = totals.setdefault((day, category), [0, 0])
+        row[0] += hits
+        row[1] += category_checks
+    conn.executemany("""
+        INSERT INTO category_daily VALUES (?, ?, ?, ?)
+        ON CONFLICT (day, category) DO UPDATE SET
+            hits = hits + excluded.hits, checks = checks + excluded.checks
+    """, [(*key, *row) for key, row in totals.items()])
+
+
+def _apply_rollup(conn: sqlite3.Connection, entries):
+    checks = {}
+    rules = {}
+    for e in entries:
+        key = (e["day"], e["domain"])
+        row = checks.setdefault(key, [0, 0, 0, 0])
+        row[0] += 1
+        row[1] += e["score"]
+        row[2] += e["violation"] > 0
+        row[3] += e["violation"] == 0 and e["risk"] > 0
+        for rule, count in zip(e["rules"], e["rule_counts"]):
+            rule_row = rules.setdefault((e["day"], e["domain"], rule), [0, 0])
+            rule_row[0] += count   # จำนวนประโยคที่โดนกฎนี้
+            rule_row[1] += 1       # จำนวนการตรวจที่โดนกฎนี้
+
+    conn.executemany("""
+        INSERT INTO check_daily VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (day, domain) DO UPDATE SET
+            checks = checks + excluded.checks, score_sum = score_sum + excluded.score_sum,
+            violation_checks = violation_checks + excluded.violation_checks,
+            risk_checks = risk_checks + excluded.risk_checks
+    """, [(*key, *row) for key, row in checks.items()])
+    conn.executemany("""
+        INSERT INTO rule_domain_daily VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (day, domain, rule) DO UPDATE SET
+            hits = hits + excluded.hits, checks = checks + excluded.checks
+    """, [(day, domain, rule, rule_category(rule), *row) for (day, domain, rule), row in rules.items()])
+
+    # ยอดรวมทุกโดเมน (รายงานภาพรวมไม่ต้องบวกข้ามโดเมนจำนวนมากทุกครั้ง)
+    totals = {}
+    for (day, _, rule), (hits, rule_checks) in rules.items():
+        row = totals.setdefault((day, rule), [0, 0])
+        row[0] += hits
+        row[1] += rule_checks
+    conn.executemany("""
+        INSERT INTO rule_daily VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (day, rule) DO UPDATE SET
+            hits = hits + excluded.hits, checks = checks + excluded.checks
+    """, [(day, rule, rule_category(rule), *row) for (day, rule), row in totals.items()])
+    _apply_category_rollup(conn, entries)
+
+
+def iter_records(start: str | None = None, end: str | None = None, domain: str | None = None):
+    """อ่านบันทึกดิบทีละรายการ (เฉพาะไฟล์ของวันที่อยู่ในช่วง)"""
+    if not os.path.isdir(AUDIT_DIR):
+        return
+    for name in sorted(os.listdir(AUDIT_DIR)):
+        if not name.endswith(".ndjson.gz"):
+            continue
+        day = name[:-len(".ndjson.gz")]
+        if (start and day < start) or (end and day > end):
+            continue
+        try:
+            with gzip.open(os.path.join(AUDIT_DIR, name), "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if domain is None or entry["domain"] == domain:
+                        yield entry
+        except (EOFError, gzip.BadGzipFile):
+            # ก้อนท้ายไฟล์เขียนไม่จบ (เครื่องดับกลางทาง) ใช้ได้ถึงก้อนก่อนหน้า
+            continue
+
+
+def rebuild_rollups() -> int:
+    """สร้างตารางสรุปใหม่ทั้งหมดจากบันทึกดิบ คืนค่าจำนวนบันทึกที่อ่าน"""
+    with _write_lock, _db() as conn:
+        conn.execute("DELETE FROM check_daily")
+        conn.execute("DELETE FROM rule_daily")
+        conn.execute("DELETE FROM rule_domain_daily")
+        conn.execute("DELETE FROM category_daily")
+        conn.execute("DELETE FROM category_domain_daily")
+        count = 0
+        chunk = []
+        for entry in iter_records():
+            chunk.append(entry)
+            if len(chunk) >= 10000:
+                _apply_rollup(conn, chunk)
+                count += len(chunk)
+                chunk = []
+        _apply_rollup(conn, chunk)
+        return count + len(chunk)
+
+
+# ==============================================================================
+# 🔎 3. คำถามสำหรับรายงาน (Query / Export)
+# ==============================================================================
+
+def default_window(start: str | None, end: str | None) -> tuple[str, str]:
+    """ไม่ระบุช่วงเวลา = 30 วันล่าสุด (วันตาม UTC, รูปแบบ YYYY-MM-DD, รวมวันแรกและวันสุดท้าย)"""
+    # แปลงเป็นรูปแบบมาตรฐานเสมอ (ผิดรูปแบบ -> ValueError) เพราะเทียบวันที่กันแบบข้อความ
+    end_day = date.fromisoformat(end) if end else datetime.now(timezone.utc).date()
+    start_day = date.fromisoformat(start) if start else end_day - timedelta(days=29)
+    return start_day.isoformat(), end_day.isoformat()
+
+
+def query_stats(group_by: str = "rule", start: str | None = None, end: str | None = None,
+                domain: str | None = None, rule: str | None = None, limit: int = 50) -> list[dict]:
+    """
+    สรุปยอดตามกลุ่มที่เลือก (อ่านจากตารางสรุปรายวันเท่านั้น)
+    - rule / category : จำนวนประโยคที่โดน (hits) + จำนวนการตรวจที่โดน (checks)
+    - domain / day    : จำนวนการตรวจ, คะแนนเฉลี่ย, จำนวนที่ผิดกฎ/เสี่ยง
+    """
+    if group_by not in GROUP_BY:
+        raise ValueError(f"group_by ต้องเป็นหนึ่งใน: {', '.join(GROUP_BY)}")
+    start, end = default_window(start, end)
+
+    where = ["day BETWEEN ? AND ?"]
+    params = [start, end]
+    if domain is not None:
+        where.append("domain = ?")
+        params.append(domain)
+
+    if group_by == "category" and rule is None:
+        # ตารางสรุปตามหมวด (checks = จำนวนการตรวจที่โดนหมวดนี้ นับครั้งเดียวต่อการตรวจ)
+        table = "category_daily" if domain is None else "category_domain_daily"
+        sql = f"""
+            SELECT category, SUM(hits), SUM(checks) FROM {table}
+            WHERE {' AND '.join(where)} GROUP BY category ORDER BY SUM(hits) DESC, category LIMIT ?
+        """
+        with _db() as conn:
+            rows = conn.execute(sql, (*params, limit)).fetchall()
+        return [{"category": k, "hits": hits, "checks": checks} for k, hits, checks in rows]
+
+    if group_by in ("rule", "category") or rule is not None:
+        if rule is not None:
+            where.append("rule = ?")
+            params.append(rule)
+        key = group_by
+        table = "rule_daily" if domain is None and group_by != "domain" else "rule_domain_daily"
+        sql = f"""
+            SELECT {key}, SUM(hits), SUM(checks) FROM {table}
+            WHERE {' AND '.join(where)} GROUP BY {key} ORDER BY SUM(hits) DESC, {key} LIMIT ?
+        """
+        with _db() as conn:
+            rows = conn.execute(sql, (*params, limit)).fetchall()
+        return [{group_by: k, "hits": hits, "checks": checks} for k, hits, checks in rows]
+
+    order = "day" if group_by == "day" else "SUM(checks) DESC, domain"
+    sql = f"""
+        SELECT {group_by}, SUM(checks), SUM(score_sum), SUM(violation_checks), SUM(risk_checks)
+        FROM check_daily WHERE {' AND '.join(where)} GROUP BY {group_by} ORDER BY {order} LIMIT ?
+    """
+    with _db() as conn:
+        rows = conn.execute(sql, (*params, limit)).fetchall()
+    return [
+        {group_by: k, "checks": checks, "avg_score": round(score_sum / checks, 2),
+         "violation_checks": violation, "risk_checks": risk}
+        for k, checks, score_sum, violation, risk in rows
+    ]
+
+
+EXPORT_COLUMNS = ("ts", "source", "url", "domain", "text_hash", "rulebooks", "score", "total",
+                  "risk", "violation", "rules", "rule_counts")
+
+
+def export_records(start: str | None = None, end: str | None = None,
+                   domain: str | None = None, fmt: str = "ndjson"):
+    """ส่งออกบันทึกดิบทีละบรรทัด (ndjson หรือ csv) สำหรับ StreamingResponse"""
+    start, end = default_window(start, end)
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(EXPORT_COLUMNS)
+        for entry in iter_records(start, end, domain):
+            writer.writerow(["|".join(map(str, v)) if isinstance(v, list) else v
+                             for v in (entry[c] for c in EXPORT_COLUMNS)])
+            if buf.tell() > 65536:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+    else:
+        for entry in iter_records(start, end, domain):
+            yield json.dumps(entry, ensure_ascii=False) + "\n"
+
+
+# ==============================================================================
+# 🖥️ 4. คำสั่งผ่าน Command Line
+# ==============================================================================
+# python audit.py stats [rule|category|domain|day] [YYYY-MM-DD] [YYYY-MM-DD]
+# python audit.py rebuild     (สร้างตารางสรุปใหม่จากบันทึกดิบ)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "stats"
+
+    if command == "stats":
+        rows = query_stats(args[1] if len(args) > 1 else "rule",
+                           args[2] if len(args) > 2 else None,
+                           args[3] if len(args) > 3 else None)
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    elif command == "rebuild":
+        print(f"✅ สร้างตารางสรุปใหม่จาก {rebuild_rollups()} บันทึก")
+    else:
+        print("วิธีใช้: python audit.py [stats [rule|category|domain|day] [เริ่ม] [สิ้นสุด] | rebuild]")
@@ -1,8 +1,6 @@
 import json
-import os
-from openai import OpenAI
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+import llm_backends
 
 
 def analyze_text(text: str, rules: dict):
@@ -23,10 +21,9 @@ def analyze_text(text: str, rules: dict):
 }}
 """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0,
-    )
+    # ผู้ให้บริการตั้งค่าได้ด้วย LLM_BACKEND_ANALYZE (ค่าเริ่มต้น: openai เหมือนเดิม)
+    content = llm_backends.generate("analyze", prompt)
 
-    return json.loads(response.choices[0].message.content)
+    # บางเจ้าชอบครอบคำตอบด้วย ```json ... ``` ตัดออกก่อนแปลง
+    content = content.strip().removeprefix("```json").removeprefix("```").removesuffix("```")
+    return json.loads(content)
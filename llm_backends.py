@@ -0,0 +1,255 @@
+import hashlib
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# พยายามโหลด .env สำหรับการรันในเครื่อง (Local)
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# ==============================================================================
+# 🔌 LLM BACKENDS (เปลี่ยน/ผสมผู้ให้บริการ AI ได้ด้วยการตั้งค่า)
+# ==============================================================================
+# ทุกผู้ให้บริการมีหน้าตาเดียวกัน: generate(prompt) -> str (มีปัญหาให้ raise)
+# เลือกได้แยกตาม "ประเภทงาน" (call type): explain / suggest / rewrite / analyze
+#
+#   LLM_BACKEND=gemini                 ค่าเริ่มต้นของทุกงาน
+#   LLM_BACKEND_SUGGEST=openai         เฉพาะงาน suggest ใช้ OpenAI
+#   LLM_HEDGE_EXPLAIN=openai           งาน explain: ถ้าตัวหลักตอบช้าเกินกำหนด ยิงซ้ำไปที่ OpenAI
+#                                      แล้วใช้คำตอบที่มาถึงก่อน (Hedged Request)
+#
+# ชื่อที่ใช้ได้: gemini, openai, stub (ตอบทันทีแบบคงที่), http-stub (loadtest/stub_llm.py)
+
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "30"))
+LLM_STUB_URL = os.environ.get("LLM_STUB_URL")
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "models/gemini-1.5-flash")
+OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+
+# Hedging: รอตัวหลักนานเท่ากับ "เปอร์เซ็นไทล์ที่ X" ของเวลาตอบที่ผ่านมา แล้วค่อยยิงตัวสำรอง
+# (p95 = ยิงซ้ำแค่ราว 5% ของคำขอ ค่าใช้จ่ายเพิ่มนิดเดียว แต่ตัดหางที่ช้าที่สุดทิ้ง)
+LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.environ.get("LLM_HEDGE_DEFAULT_DELAY", "3.0"))  # วินาที (ก่อนมีสถิติพอ)
+# คำขอแบบ sync ของ FastAPI รันพร้อมกันได้สูงสุด 40 (threadpool ของ anyio) แต่ละคำขอใช้ได้ 2 เธรด (ตัวหลัก + สำรอง)
+LLM_HEDGE_WORKERS = int(os.environ.get("LLM_HEDGE_WORKERS", "80"))
+
+# ค่าเริ่มต้นเดิมของแต่ละงาน (analyze เคยผูกกับ OpenAI ใน llm.py)
+_DEFAULT_BACKENDS = {"analyze": "openai"}
+
+
+# ==============================================================================
+# 🧩 1. ผู้ให้บริการแต่ละเจ้า
+# ==============================================================================
+
+class LLMBackend(ABC):
+    """แม่แบบของผู้ให้บริการ AI (สร้างครั้งเดียว ใช้ร่วมกันทุกเธรด)"""
+    name = "base"
+
+    @abstractmethod
+    def generate(self, prompt: str) -> str:
+        """ส่ง prompt แล้วคืนข้อความตอบกลับ (มีปัญหาให้ raise)"""
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name: str = GEMINI_MODEL):
+        import google.generativeai as genai
+
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            print("⚠️ Error: ไม่พบ GOOGLE_API_KEY ในระบบ (ตรวจสอบ .env หรือ Render Settings)")
+        else:
+            genai.configure(api_key=api_key)
+
+        # ใช้ชื่อเต็ม 'models/gemini-1.5-flash' เพื่อความชัวร์ที่สุดบน Render
+        self.model = genai.GenerativeModel(model_name)
+        print("✅ Gemini AI Ready!")
+
+    def generate(self, prompt: str) -> str:
+        response = self.model.generate_content(prompt, request_options={"timeout": LLM_TIMEOUT})
+        return response.text.strip()
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def __init__(self, model_name: str = OPENAI_MODEL):
+        # openai ไม่ได้อยู่ใน requirements.txt (ติดตั้งเพิ่มเฉพาะเมื่อเลือกใช้)
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=LLM_TIMEOUT)
+        self.model_name = model_name
+
+    def generate(self, prompt: str) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+        )
+        return response.choices[0].message.content.strip()
+
+
+class StubBackend(LLMBackend):
+    """ตอบทันทีโดยไม่ต่อเน็ต (prompt เดิม = คำตอบเดิมทุกครั้ง) ใช้ตอนพัฒนา/ทดสอบ"""
+    name = "stub"
+
+    def generate(self, prompt: str) -> str:
+        digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).hexdigest()
+        if "JSON" in prompt:
+            return '{"risk": "ไม่เสี่ยง", "reason": "stub ' + digest + '", "highlight": []}'
+        return f"[stub {digest}] ข้อความนี้มีคำที่อาจเข้าข่ายโฆษณาเกินจริง"
+
+
+class HTTPStubBackend(LLMBackend):
+    """ยิงไปที่ Stub LLM Server (loadtest/stub_llm.py) ที่จำลอง latency/error ได้"""
+    name = "http-stub"
+
+    def __init__(self, url: str | None = LLM_STUB_URL):
+        import requests
+
+        if not url:
+            raise ValueError("ต้องตั้งค่า LLM_STUB_URL ก่อนใช้ http-stub")
+        self.url = url
+        self.session = requests.Session()
+
+    def generate(self, prompt: str) -> str:
+        res = self.session.post(self.url, json={"prompt": prompt}, timeout=LLM_TIMEOUT)
+        res.raise_for_status()
+        return res.json()["text"].strip()
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "openai": OpenAIBackend,
+    "stub": StubBackend,
+    "http-stub": HTTPStubBackend,
+}
+
+_instances: dict[str, LLMBackend] = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name: str) -> LLMBackend:
+    """สร้างผู้ให้บริการครั้งแรกที่ถูกเรียก แล้วใช้ตัวเดิมตลอด (ไม่ต้องลง library ของเจ้าที่ไม่ได้ใช้)"""
+    if name not in BACKENDS:
+        raise ValueError(f"ไม่รู้จัก LLM backend '{name}' (มี: {', '.join(BACKENDS)})")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
+
+
+# ==============================================================================
+# ⚙️ 2. เลือกผู้ให้บริการตามประเภทงาน
+# ==============================================================================
+
+def backend_for(call_type: str) -> tuple[str, str | None]:
+    """
+    คืนค่า (ชื่อตัวหลัก, ชื่อตัวสำรองสำหรับ hedging หรือ None)
+    ลำดับ: LLM_BACKEND_<งาน> > LLM_BACKEND > http-stub (ถ้าตั้ง LLM_STUB_URL) > ค่าเริ่มต้นของงาน
+    """
+    key = call_type.upper()
+    primary = (os.environ.get(f"LLM_BACKEND_{key}")
+               or os.environ.get("LLM_BACKEND")
+               or ("http-stub" if LLM_STUB_URL else None)
+               or _DEFAULT_BACKENDS.get(call_type, "gemini"))
+    secondary = os.environ.get(f"LLM_HEDGE_{key}") or None
+    if secondary == primary:
+        secondary = None
+    return primary, secondary
+
+
+# ==============================================================================
+# ⏱️ 3. สถิติเวลาตอบ + Hedged Request
+# ==============================================================================
+
+class LatencyTracker:
+    """เก็บเวลาตอบล่าสุด N ครั้งต่อผู้ให้บริการ (ใช้คำนวณเวลารอก่อนยิงตัวสำรอง)"""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        with self.lock:
+            if len(self.samples) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            values = sorted(self.samples)
+        rank = max(1, int(-(-p * len(values) // 100)))  # nearest-rank
+        return values[rank - 1]
+
+
+_latency: dict[str, LatencyTracker] = {name: LatencyTracker() for name in BACKENDS}
+_hedge_pool = ThreadPoolExecutor(max_workers=LLM_HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+hedge_stats = {"calls": 0, "hedged": 0, "secondary_won": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str):
+    with _stats_lock:
+        hedge_stats[key] += 1
+
+
+def _timed_generate(name: str, prompt: str) -> str:
+    backend = get_backend(name)
+    started = time.perf_counter()
+    result = backend.generate(prompt)
+    # บันทึกเฉพาะที่สำเร็จ (รวมตัวที่แพ้ hedging ด้วย ไม่งั้นสถิติจะเอียงไปทางเร็ว)
+    _latency[name].record(time.perf_counter() - started)
+    return result
+
+
+def hedge_delay(name: str) -> float:
+    delay = _latency[name].percentile(LLM_HEDGE_PERCENTILE)
+    return LLM_HEDGE_DEFAULT_DELAY if delay is None else delay
+
+
+def generate(call_type: str, prompt: str) -> str:
+    """
+    ส่ง prompt ไปยังผู้ให้บริการที่ตั้งค่าไว้สำหรับงานนี้
+    - ไม่มีตัวสำรอง: เรียกตรงๆ
+    - มีตัวสำรอง: รอตัวหลักตาม hedge_delay ถ้ายังไม่ตอบ (หรือพังก่อน) ยิงตัวสำรองแล้วเอาคำตอบแรกที่สำเร็จ
+    มีปัญหาทุกตัว -> raise exception ของตัวหลัก
+    """
+    primary, secondary = backend_for(call_type)
+    if secondary is None:
+        return _timed_generate(primary, prompt)
+
+    _count("calls")
+    started = threading.Event()
+
+    def _primary():
+        started.set()
+        return _timed_generate(primary, prompt)
+
+    primary_future = _hedge_pool.submit(_primary)
+    # เริ่มจับเวลาเมื่อตัวหลักเริ่มทำงานจริง (pool เต็ม = รอคิว ไม่ใช่ตัวหลักช้า ยิงตัวสำรองไปก็ต้องรอคิวเหมือนกัน)
+    started.wait()
+    done, _ = wait([primary_future], timeout=hedge_delay(primary))
+    if done and primary_future.exception() is None:
+        return primary_future.result()
+
+    _count("hedged")
+    secondary_future = _hedge_pool.submit(_timed_generate, secondary, prompt)
+    pending = {primary_future, secondary_future}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # ตัวที่แพ้ยังวิ่งต่อในพื้นหลังจนจบ (ยกเลิก HTTP ที่ส่งไปแล้วไม่ได้)
+                if future is secondary_future:
+                    _count("secondary_won")
+                return future.result()
+
+    return primary_future.result()  # พังทั้งคู่ -> raise error ของตัวหลัก
@@ -1,54 +1,23 @@
-import google.generativeai as genai
-import os
-
-# พยายามโหลด .env สำหรับการรันในเครื่อง (Local)
-# ส่วนบน Render จะข้ามส่วนนี้ไปเองอัตโนมัติ ไม่ต้องกังวลครับ
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass
+import llm_backends
 
 # ==============================================================================
-# ☁️ CONFIGURATION (ตั้งค่า Google Gemini)
+# ☁️ CONFIGURATION
 # ==============================================================================
-
-# 1. ดึง API Key จากระบบ
-api_key = os.environ.get("GOOGLE_API_KEY")
-
-# 2. ตรวจสอบและตั้งค่า Key (ส่วนที่ขาดไปก่อนหน้านี้)
-if not api_key:
-    print("⚠️ Error: ไม่พบ GOOGLE_API_KEY ในระบบ (ตรวจสอบ .env หรือ Render Settings)")
-else:
-    genai.configure(api_key=api_key)
-
-# 3. ตั้งค่าโมเดล AI
-try:
-    # ใช้ชื่อเต็ม 'models/gemini-1.5-flash' เพื่อความชัวร์ที่สุดบน Render
-    model = genai.GenerativeModel('models/gemini-1.5-flash')
-    print("✅ Gemini AI Ready!")
-except Exception as e:
-    print(f"⚠️ ตั้งค่า AI ไม่สำเร็จ: {e}")
+# การตั้งค่าผู้ให้บริการ AI (Gemini / OpenAI / Stub) และ Hedging ย้ายไปอยู่ที่ llm_backends.py
+# ค่าเริ่มต้นยังเป็น Gemini เหมือนเดิม (ใช้ GOOGLE_API_KEY จาก .env หรือ Render Settings)
 
 
 # ==============================================================================
-# ⚙️ SYSTEM ENGINE (เครื่องยนต์ AI - Gemini Only)
+# ⚙️ SYSTEM ENGINE (เครื่องยนต์ AI)
 # ==============================================================================
 
-def _call_llm(prompt: str) -> str:
+def _call_llm(prompt: str, call_type: str = "explain") -> str:
     """
-    ฟังก์ชันส่งข้อความไปหา Gemini บน Cloud
+    ฟังก์ชันส่งข้อความไปหาผู้ให้บริการ AI ที่ตั้งค่าไว้สำหรับงานประเภทนี้
     """
     try:
-        # ตรวจสอบก่อนว่า model ถูกสร้างหรือยัง
-        if 'model' not in globals():
-            return "⚠️ ระบบ AI ยังไม่ถูกตั้งค่า (Model not initialized)"
-
-        # ส่งคำถามไป
-        response = model.generate_content(prompt)
-        # ส่งคำตอบกลับมา (ตัดช่องว่างหน้าหลัง)
-        return response.text.strip()
-    
+        return llm_backends.generate(call_type, prompt)
+
     except Exception as e:
         # แจ้งเตือนถ้ามีปัญหา (เช่น เน็ตหลุด, Key ผิด, Quota เต็ม)
         return f"⚠️ ระบบ AI ขัดข้อง: {str(e)}"
@@ -87,7 +56,7 @@ def explain_with_llm(text: str, found_words: list[str]) -> str:
 
 *ตอบเป็นภาษาไทยทางการ ห้ามเกริ่นนำว่า "ได้ครับ" ให้ตอบเนื้อหาเลย*
 """
-    return _call_llm(prompt)
+    return _call_llm(prompt, "explain")
 
 
 def suggest_safe_text(original_text: str) -> str:
@@ -111,7 +80,7 @@ def suggest_safe_text(original_text: str) -> str:
 [รูปแบบคำตอบ]
 ขอเฉพาะ "ข้อความใหม่" เท่านั้น ห้ามมีคำอธิบายประกอบ ห้ามใส่เครื่องหมายคำพูดเปิดปิด
 """
-    return _call_llm(prompt)
+    return _call_llm(prompt, "suggest")
 
 
 def rewrite_sentence_safe(sentence: str) -> str:
@@ -127,4 +96,4 @@ def rewrite_sentence_safe(sentence: str) -> str:
 
 ตอบเฉพาะประโยคใหม่เท่านั้น:
 """
-    return _call_llm(prompt)
\ No newline at end of file
+    return _call_llm(prompt, "rewrite")
\ No newline at end of file
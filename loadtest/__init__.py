@@ -0,0 +1,8 @@
+# ==============================================================================
+# 🏋️ LOAD TEST HARNESS (ทดสอบรับโหลดในเครื่อง ไม่ต้องต่อเน็ต)
+# ==============================================================================
+# - stub_llm.py  : เซิร์ฟเวอร์ปลอมแทน Gemini (ปรับ latency / error rate ได้)
+# - stub_site.py : เซิร์ฟเวอร์ปลอมแทนเว็บร้านค้า (เสิร์ฟไฟล์ใน fixtures/)
+# - run.py       : เปิดทุกอย่างแล้วยิง /check-web, /check-url, /suggest พร้อมกัน
+#
+# วิธีใช้: python -m loadtest.run --concurrency 32 --requests 500
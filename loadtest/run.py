@@ -0,0 +1,232 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from loadtest.stub_llm import StubLLMConfig, start_stub_llm
+from loadtest.stub_site import FIXTURES_DIR, start_stub_site
+
+# ==============================================================================
+# 🏋️ LOAD TEST RUNNER
+# ==============================================================================
+# 1. เปิด Stub LLM + Stub Site ในโปรเซสนี้
+# 2. เปิดแอป (uvicorn main:app) เป็นโปรเซสแยก โดยชี้ LLM_STUB_URL / SCRAPER_BASE_URL มาที่ stub
+# 3. ยิงคำขอพร้อมกันตามจำนวน concurrency แล้วสรุป throughput + p50/p95/p99 แยกตาม endpoint
+#
+# ตัวอย่าง:
+#   python -m loadtest.run --concurrency 64 --requests 1000 --llm-latency 1500
+#   python -m loadtest.run --mix check-web=1 --no-cache        (วัดเฉพาะ rule-based ไม่ใช้ cache)
+#   python -m loadtest.run --target http://127.0.0.1:8000       (ยิงแอปที่เปิดไว้อยู่แล้ว)
+
+ENDPOINTS = ("check-web", "check-url", "suggest")
+# แอปจับ exception แล้วตอบ 200 พร้อมข้อความแจ้งเตือน -> ต้องดูเนื้อหาด้วย ไม่งั้นนับเป็นสำเร็จ
+FAILURE_MARKERS = {
+    "ai-err": "⚠️ ระบบ AI ขัดข้อง",          # llm_explainer._call_llm
+    "page-err": "<h2>เกิดข้อผิดพลาด</h2>",   # หน้า error ของ /check-url
+}
+ERROR_KINDS = ("http-err", *FAILURE_MARKERS)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_ads(path: str = os.path.join(FIXTURES_DIR, "ads.txt")) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """'check-web=6,check-url=3,suggest=1' -> น้ำหนักการสุ่มของแต่ละ endpoint"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"ไม่รู้จัก endpoint '{name}' (มี: {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """เปอร์เซ็นไทล์แบบ nearest-rank (ค่าที่เกิดขึ้นจริง ไม่ใช่ค่าประมาณ)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(-(-p * len(sorted_values) // 100)))  # ceil(p/100 * n)
+    return sorted_values[rank - 1]
+
+
+# ==============================================================================
+# 🚀 1. เปิดแอปเป็นโปรเซสแยก
+# ==============================================================================
+
+def start_app(port: int, env: dict, workers: int) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", "main:app",
+           "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+           "--workers", str(workers)]
+    return subprocess.Popen(cmd, cwd=ROOT_DIR, env={**os.environ, **env})
+
+
+def wait_ready(base_url: str, proc: subprocess.Popen | None, timeout: float = 30) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            return False
+        try:
+            if requests.get(base_url + "/", timeout=1).ok:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+# ==============================================================================
+# 🔫 2. ยิงคำขอ
+# ==============================================================================
+
+def classify(res: requests.Response | None) -> str | None:
+    """คืนค่าชนิดความล้มเหลว (ดู ERROR_KINDS) หรือ None ถ้าสำเร็จจริง"""
+    if res is None or res.status_code != 200:
+        return "http-err"   # ต่อไม่ได้ / timeout / ไม่ใช่ 200
+    for kind, marker in FAILURE_MARKERS.items():
+        if marker in res.text:
+            return kind
+    return None
+
+
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)   # endpoint -> วินาทีต่อคำขอ (เฉพาะที่สำเร็จ)
+        self.errors = {kind: defaultdict(int) for kind in ERROR_KINDS}   # ชนิด -> endpoint -> จำนวน
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, elapsed: float, error: str | None):
+        with self._lock:
+            if error is None:
+                self.latencies[endpoint].append(elapsed)
+            else:
+                self.errors[error][endpoint] += 1
+
+
+def run_load(base_url: str, mix: dict[str, float], total: int, concurrency: int,
+             ads: list[str], site_paths: list[str], seed: int) -> tuple[Results, float]:
+    rng = random.Random(seed)
+    names = list(mix)
+    plan = rng.choices(names, weights=[mix[n] for n in names], k=total)
+    payloads = []
+    for endpoint in plan:
+        if endpoint == "check-url":
+            # โดเมนสมมติ scraper จะเปลี่ยนไปดึงจาก Stub Site ตาม SCRAPER_BASE_URL
+            payloads.append({"url": "https://shop.example.com" + rng.choice(site_paths)})
+        else:
+            payloads.append({"text": rng.choice(ads)})
+
+    results = Results()
+    local = threading.local()
+
+    def _one(i: int):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        endpoint = plan[i]
+        started = time.perf_counter()
+        try:
+            res = session.post(f"{base_url}/{endpoint}", data=payloads[i], timeout=120)
+        except requests.RequestException:
+            res = None
+        results.record(endpoint, time.perf_counter() - started, classify(res))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(_one, range(total)))
+    return results, time.perf_counter() - started
+
+
+def print_report(results: Results, wall: float, concurrency: int, llm_config: StubLLMConfig):
+    print(f"\n📊 ผลการทดสอบ (concurrency {concurrency}, ใช้เวลา {wall:.2f} s)")
+    # ok/req/s/เปอร์เซ็นไทล์ นับเฉพาะที่สำเร็จจริง, http-err = ไม่ใช่ 200, ai-err/page-err = ตอบ 200 แต่เป็นข้อความ error
+    print(f"{'endpoint':<12}{'ok':>7}" + "".join(f"{kind:>10}" for kind in ERROR_KINDS)
+          + f"{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    total_ok = 0
+    total_err = dict.fromkeys(ERROR_KINDS, 0)
+    for endpoint in ENDPOINTS:
+        lat = sorted(results.latencies.get(endpoint, []))
+        err = {kind: results.errors[kind].get(endpoint, 0) for kind in ERROR_KINDS}
+        if not lat and not any(err.values()):
+            continue
+        total_ok += len(lat)
+        for kind in ERROR_KINDS:
+            total_err[kind] += err[kind]
+        print(f"{endpoint:<12}{len(lat):>7}" + "".join(f"{err[kind]:>10}" for kind in ERROR_KINDS)
+              + f"{len(lat) / wall:>9.1f}"
+              f"{percentile(lat, 50) * 1000:>10.1f}{percentile(lat, 95) * 1000:>10.1f}"
+              f"{percentile(lat, 99) * 1000:>10.1f}{(lat[-1] if lat else 0) * 1000:>10.1f}")
+    print(f"{'รวม':<12}{total_ok:>7}" + "".join(f"{total_err[kind]:>10}" for kind in ERROR_KINDS)
+          + f"{total_ok / wall:>9.1f}")
+    print(f"🤖 Stub LLM ถูกเรียก {llm_config.calls} ครั้ง (จำลอง error {llm_config.errors} ครั้ง)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test ในเครื่อง ด้วย Stub LLM + Stub Site")
+    parser.add_argument("--concurrency", type=int, default=16, help="จำนวนคำขอที่ยิงพร้อมกัน")
+    parser.add_argument("--requests", type=int, default=200, help="จำนวนคำขอทั้งหมด")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("check-web=6,check-url=3,suggest=1"),
+                        help="สัดส่วน endpoint เช่น check-web=6,check-url=3,suggest=1")
+    parser.add_argument("--llm-latency", type=float, default=800, help="เวลาตอบเฉลี่ยของ Stub LLM (ms)")
+    parser.add_argument("--llm-jitter", type=float, default=400, help="สุ่มบวกลบ (ms)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="สัดส่วนที่ LLM ตอบ error (0-1)")
+    parser.add_argument("--site-latency", type=float, default=50, help="เวลาตอบของ Stub Site (ms)")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--app-workers", type=int, default=1, help="จำนวน uvicorn worker")
+    parser.add_argument("--no-cache", action="store_true", help="ปิด near-duplicate cache (วัดงานเต็มทุกครั้ง)")
+    parser.add_argument("--target", help="ยิงแอปที่เปิดอยู่แล้ว (ไม่เปิดแอปใหม่ ต้องตั้ง env เอง)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    llm_server, llm_config = start_stub_llm(config=StubLLMConfig(
+        args.llm_latency, args.llm_jitter, args.llm_error_rate))
+    site_server, site_paths = start_stub_site(latency_ms=args.site_latency)
+    print(f"🤖 Stub LLM  : http://127.0.0.1:{llm_server.server_port}/")
+    print(f"🌐 Stub Site : http://127.0.0.1:{site_server.server_port} ({len(site_paths)} หน้า)")
+
+    proc = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.target:
+            base_url = args.target.rstrip("/")
+        else:
+            base_url = f"http://127.0.0.1:{args.app_port}"
+            env = {
+                "LLM_STUB_URL": f"http://127.0.0.1:{llm_server.server_port}/",
+                "SCRAPER_BASE_URL": f"http://127.0.0.1:{site_server.server_port}",
+                "NEARDUP_PATH": os.path.join(tmp_dir, "neardup_index.json.gz"),
+                "AUDIT_DIR": os.path.join(tmp_dir, "audit_data"),   # ไม่ปนกับบันทึกจริงของเครื่อง
+            }
+            if args.no_cache:
+                env["NEARDUP_MAX_ENTRIES"] = "0"
+            proc = start_app(args.app_port, env, args.app_workers)
+
+        try:
+            if not wait_ready(base_url, proc):
+                print(f"❌ แอปไม่พร้อมที่ {base_url}")
+                return 1
+            print(f"🚀 ยิง {args.requests} คำขอ ไปที่ {base_url} ...")
+            results, wall = run_load(base_url, args.mix, args.requests, args.concurrency,
+                                     load_ads(), site_paths, args.seed)
+            print_report(results, wall, args.concurrency, llm_config)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=10)
+            llm_server.shutdown()
+            site_server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==============================================================================
+# 🤖 STUB LLM SERVER (Gemini ปลอมสำหรับ Load Test)
+# ==============================================================================
+# รับ POST {"prompt": "..."} แล้วตอบ {"text": "..."} หลังหน่วงเวลาตามที่ตั้งไว้
+# llm_explainer._call_llm จะยิงมาที่นี่แทน Gemini เมื่อตั้งค่า LLM_STUB_URL
+
+
+class StubLLMConfig:
+    """ค่าที่ปรับได้ระหว่างรัน (เธรดหลักแก้ได้ทันที ไม่ต้องรีสตาร์ท)"""
+
+    def __init__(self, latency_ms: float = 800, jitter_ms: float = 400, error_rate: float = 0.0):
+        self.latency_ms = latency_ms      # เวลาตอบเฉลี่ย (Gemini จริงประมาณ 0.5-3 วินาที)
+        self.jitter_ms = jitter_ms        # สุ่มบวกลบรอบค่าเฉลี่ย
+        self.error_rate = error_rate      # สัดส่วนคำขอที่ตอบ HTTP 500 (0.0 - 1.0)
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, is_error: bool):
+        with self._lock:
+            self.calls += 1
+            if is_error:
+                self.errors += 1
+
+
+def _make_handler(config: StubLLMConfig):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                prompt = json.loads(self.rfile.read(length) or b"{}").get("prompt", "")
+            except json.JSONDecodeError:
+                prompt = ""
+
+            delay = max(0.0, config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms))
+            time.sleep(delay / 1000)
+
+            is_error = random.random() < config.error_rate
+            config.record(is_error)
+            if is_error:
+                self._send(500, {"error": "stub: simulated failure"})
+                return
+
+            text = f"[stub] ข้อความนี้มีคำที่อาจเข้าข่ายโฆษณาเกินจริง (prompt {len(prompt)} ตัวอักษร)"
+            self._send(200, {"text": text})
+
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # ปิด log ทุกคำขอ (รก terminal ตอนยิงหลักพันครั้ง)
+
+    return Handler
+
+
+def start_stub_llm(host: str = "127.0.0.1", port: int = 0,
+                   config: StubLLMConfig | None = None) -> tuple[ThreadingHTTPServer, StubLLMConfig]:
+    """เปิดเซิร์ฟเวอร์ในเธรดแยก (port=0 ให้ระบบเลือกพอร์ตว่างให้)"""
+    config = config or StubLLMConfig()
+    server = ThreadingHTTPServer((host, port), _make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, config
+
+
+# python -m loadtest.stub_llm [port] [latency_ms] [error_rate]
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8101
+    cfg = StubLLMConfig(
+        latency_ms=float(sys.argv[2]) if len(sys.argv) > 2 else 800,
+        error_rate=float(sys.argv[3]) if len(sys.argv) > 3 else 0.0,
+    )
+    srv, _ = start_stub_llm(port=port, config=cfg)
+    print(f"🤖 Stub LLM: http://127.0.0.1:{srv.server_port}/ (Ctrl+C เพื่อหยุด)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
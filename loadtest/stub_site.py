@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==============================================================================
+# 🌐 STUB SITE SERVER (เว็บร้านค้าปลอมสำหรับ Load Test)
+# ==============================================================================
+# เสิร์ฟไฟล์ .html ใน loadtest/fixtures/ ตามชื่อ path เช่น /product-1 -> product-1.html
+# scraper.scrape_text จะดึงจากที่นี่แทนเว็บจริงเมื่อตั้งค่า SCRAPER_BASE_URL
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_pages(fixtures_dir: str = FIXTURES_DIR) -> dict[str, bytes]:
+    """โหลดทุกหน้าเข้าหน่วยความจำครั้งเดียว (ไม่ให้ disk I/O ปนในผลวัด)"""
+    pages = {}
+    for name in sorted(os.listdir(fixtures_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(fixtures_dir, name), "rb") as f:
+                pages["/" + name[:-len(".html")]] = f.read()
+    return pages
+
+
+def _make_handler(pages: dict[str, bytes], latency_ms: float):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+
+            body = pages.get(self.path.split("?", 1)[0].rstrip("/"))
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub_site(host: str = "127.0.0.1", port: int = 0,
+                    latency_ms: float = 50) -> tuple[ThreadingHTTPServer, list[str]]:
+    """เปิดเซิร์ฟเวอร์ในเธรดแยก คืนค่า (server, รายการ path ที่มี)"""
+    pages = load_pages()
+    server = ThreadingHTTPServer((host, port), _make_handler(pages, latency_ms))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, list(pages)
+
+
+# python -m loadtest.stub_site [port] [latency_ms]
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8102
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    srv, paths = start_stub_site(port=port, latency_ms=latency)
+    print(f"🌐 Stub Site: http://127.0.0.1:{srv.server_port} -> {', '.join(paths)} (Ctrl+C เพื่อหยุด)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
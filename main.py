@@ -1,92 +1,47 @@
-from fastapi import FastAPI, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Form, HTTPException
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+from pydantic import BaseModel
 import html
 import re  # ใช้สำหรับการตัดคำ (Regular Expression) เพื่อนับจำนวนประโยค
 
 # Import โมดูลที่เราเขียนแยกไว้ (ต้องมีไฟล์พวกนี้อยู่ในโฟลเดอร์เดียวกันนะ)
-from rules import check_exaggeration       # ฟังก์ชันตรวจคำผิดด้วย Rule-based
+from rules import check_exaggeration, cap_text, DEFAULT_RULEBOOKS, RULEBOOK_LABELS, LARGE_DOC_MAX_CHARS  # ฟังก์ชันตรวจคำผิดด้วย Rule-based + สมุดกฎ
 from scraper import scrape_text            # ฟังก์ชันดึงข้อความจาก URL
-from llm_explainer import explain_with_llm, suggest_safe_text # ฟังก์ชันคุยกับ AI
+from llm_explainer import suggest_safe_text # ฟังก์ชันคุยกับ AI
+from neardup import check_with_reuse      # ยืมผลตรวจของข้อความที่เกือบซ้ำกับของเดิม
+from models import encode_batch           # แปลงผลตรวจหลายรายการเป็น JSON แบบเร็ว
+from scoring import DEFAULT_WEIGHTS, ScoreWeights, score_from_counts  # สูตรคำนวณคะแนน
+import audit                              # เก็บผลตรวจไว้ทำรายงานย้อนหลัง
 
 app = FastAPI()
 
 # ==========================================
 # 🧠 ส่วนที่ 1: Logic การคำนวณคะแนน (Score System)
 # ==========================================
-def calculate_ad_score(text, bad_sentences):
+def calculate_ad_score(text, bad_sentences, weights: ScoreWeights = DEFAULT_WEIGHTS):
     """
     ฟังก์ชันคำนวณคะแนนความปลอดภัยของโฆษณา
     * ใช้ระบบ Density: คิด % คำผิดเทียบกับความยาวบทความ
     * เหมาะสำหรับทั้ง Caption สั้นๆ และ Website ยาวๆ
+    * สูตรหักคะแนน + Safety Cap อยู่ใน scoring.py (ใช้ร่วมกับตัวคิดคะแนนแบบ Batch)
     """
     
     # 1.1 ตัดประโยคเพื่อหาจำนวนทั้งหมด (Total Sentences)
     all_sentences = [s.strip() for s in re.split(r'[\n.!?]+', text) if s.strip()]
-    total_sentences = max(1, len(all_sentences)) # ป้องกันการหารด้วย 0
-    
-    # 1.2 กำหนดคำต้องห้ามร้ายแรง (Violation) -> ผิดกฎหมายชัดเจน
-    violation_keywords = ["รักษา", "หายขาด", "บำบัด", "ป้องกันโรค", "รับรองผล", "การันตี", "เห็นผลจริง", "100%"]
     
     count_violation = 0  # ตัวนับ: ผิดกฎ (สีแดง)
     count_risk = 0       # ตัวนับ: เสี่ยง (สีเหลือง)
     
-    # 1.3 วนลูปเช็ครายการที่ผิด
+    # 1.2 วนลูปนับรายการที่ผิด
+    # ระดับความรุนแรงคำนวณไว้แล้วตอนสแกน (SentenceHit.violation อ้างอิง rules.VIOLATION_KEYWORDS)
     for item in bad_sentences:
-        is_violation = False
-        # เช็คว่าคำที่ผิด มีคำร้ายแรงผสมอยู่ไหม
-        for w in item['words']:
-            if any(k in w for k in violation_keywords):
-                is_violation = True
-                break
-        
-        if is_violation:
+        if item.violation:
             count_violation += 1
-            item['severity'] = 'violation' 
         else:
             count_risk += 1
-            item['severity'] = 'risk'
-
-    # 1.4 คำนวณจำนวนที่ผ่าน (Pass)
-    total_bad = count_violation + count_risk
-    
-    # กันเหนียวเผื่อตัดประโยคผิดพลาด (ไม่ให้ติดลบ)
-    if total_bad > total_sentences:
-        total_sentences = total_bad
-        
-    count_pass = max(0, total_sentences - total_bad)
-    
-    # ---------------------------------------------------
-    # 🔥 สูตรใหม่: หักคะแนนตาม "ความหนาแน่น" (Density)
-    # ---------------------------------------------------
-    # หาอัตราส่วนคำผิด (0.0 - 1.0)
-    risk_ratio = count_risk / total_sentences
-    violation_ratio = count_violation / total_sentences
-    
-    # ตัวคูณบทลงโทษ (Penalty Multiplier)
-    # - Risk: คูณ 1.5 (ผิด 10% หัก 15 คะแนน)
-    # - Violation: คูณ 5.0 (ผิด 10% หัก 50 คะแนน)
-    deduction = (risk_ratio * 100 * 1.5) + (violation_ratio * 100 * 5.0)
-    
-    score = 100 - deduction
-    
-    # ---------------------------------------------------
-    # 🔒 กฎเหล็ก (Safety Cap): ผิดกฎหมาย 1 จุด = สอบตกทันที
-    # ---------------------------------------------------
-    # ต่อให้ข้อความยาวมาก แต่ถ้ามีคำว่า "รักษาหายขาด" (Red) แค่คำเดียว
-    # ต้องปรับตกเพื่อให้ User แก้ไขก่อน (คะแนนไม่เกิน 49 = สีแดง/ส้ม)
-    if count_violation > 0:
-        score = min(score, 49)
-        
-    score = max(0, int(score)) # ปัดเศษเป็นจำนวนเต็มและห้ามติดลบ
 
-    # ส่งค่ากลับไปแสดงผล
-    return {
-        "score": score,
-        "total": total_sentences,
-        "pass": count_pass,
-        "risk": count_risk,
-        "violation": count_violation
-    }
+    # 1.3 คำนวณคะแนนจากจำนวนนับ (score / total / pass / risk / violation)
+    return score_from_counts(len(all_sentences), count_risk, count_violation, weights)
 
 # ==========================================
 # 🎨 ส่วนที่ 2: HTML/CSS Template (UI)
@@ -280,6 +235,37 @@ def highlight_sentence(sentence: str, words: list[str]) -> str:
         )
     return sentence
 
+def rulebook_checkboxes() -> str:
+    """ช่องเลือกสมุดกฎ (ประเภทสินค้า) สำหรับใส่ในฟอร์ม"""
+    boxes = "".join(
+        f'<label style="margin-right:15px; font-size:0.9rem;">'
+        f'<input type="checkbox" name="rulebooks" value="{name}"{" checked" if name in DEFAULT_RULEBOOKS else ""}> {label}'
+        f'</label>'
+        for name, label in RULEBOOK_LABELS.items()
+    )
+    return f'<div style="margin-bottom:15px; color:#4B5563;">📒 ประเภทสินค้า: {boxes}</div>'
+
+def validate_rulebooks(rulebooks: list[str] | None):
+    """สมุดกฎที่ไม่รู้จัก -> ตอบ 400 ทันที (แทนที่จะไปพังเป็น 500 ตอนตรวจ)"""
+    unknown = [name for name in rulebooks or () if name not in RULEBOOK_LABELS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"ไม่รู้จักสมุดกฎ: {', '.join(unknown)} (มี: {', '.join(RULEBOOK_LABELS)})",
+        )
+
+# ฟอร์มหน้าเว็บส่งแบบ urlencoded: Starlette รับได้ไม่เกิน 1MB ต่อช่อง (อักษรไทย 1 ตัว = 9 ไบต์หลัง encode)
+# จึงจำกัดช่องข้อความไว้ที่ 100,000 ตัวอักษร (เกินจากนี้ได้ JSON 400 แทนหน้าผลตรวจ)
+# เอกสารยาวระดับ LARGE_DOC_THRESHOLD ขึ้นไปจึงมาได้ทาง /check-url และ /api/check-batch (JSON) เท่านั้น
+WEB_FORM_MAX_CHARS = 100_000
+
+def truncated_notice(truncated: bool) -> str:
+    """แจ้งเตือนเมื่อข้อความยาวเกินกำหนดและถูกตัดบางส่วนออกก่อนตรวจ"""
+    if not truncated:
+        return ""
+    return (f'<div class="card" style="border-left:4px solid #F59E0B; color:#92400E;">'
+            f'✂️ ข้อความยาวเกิน {LARGE_DOC_MAX_CHARS:,} ตัวอักษร ระบบตรวจเฉพาะส่วนต้นเท่านั้น</div>')
+
 # ==========================================
 # 🚀 ส่วนที่ 3: Routes (Endpoints)
 # ==========================================
@@ -287,13 +273,17 @@ def highlight_sentence(sentence: str, words: list[str]) -> str:
 @app.get("/", response_class=HTMLResponse)
 def home():
     """หน้าแรก: เพิ่มส่วน How it works ตามที่ขอมา"""
-    content = """
+    content = f"""
     <div style="display: grid; grid-template-columns: 1fr; gap: 20px;">
         
         <div class="card">
             <h3>📝 ตรวจสอบจากข้อความ</h3>
             <form method="post" action="/check-web" onsubmit="showLoading()">
-                <textarea name="text" rows="5" placeholder="วางข้อความโฆษณาของคุณที่นี่..."></textarea>
+                <textarea name="text" rows="5" maxlength="{WEB_FORM_MAX_CHARS}" placeholder="วางข้อความโฆษณาของคุณที่นี่..."></textarea>
+                <div style="margin-bottom:10px; color:#6B7280; font-size:0.85rem;">
+                    รับได้ไม่เกิน {WEB_FORM_MAX_CHARS:,} ตัวอักษร (ยาวกว่านี้ใช้ตรวจจากเว็บไซต์ หรือ API /api/check-batch)
+                </div>
+                {rulebook_checkboxes()}
                 <div style="text-align: right;">
                     <button type="submit">🔍 ตรวจสอบทันที</button>
                 </div>
@@ -304,6 +294,7 @@ def home():
             <h3>🌐 ตรวจสอบจากเว็บไซต์</h3>
             <form method="post" action="/check-url" onsubmit="showLoading()">
                 <input type="text" name="url" placeholder="https://example.com/product">
+                {rulebook_checkboxes()}
                 <div style="text-align: right;">
                     <button type="submit" style="background-color: #059669;">🔗 ดึงข้อมูลและตรวจสอบ</button>
                 </div>
@@ -347,12 +338,19 @@ def home():
 
 
 @app.post("/check-web", response_class=HTMLResponse)
-def check_web(text: str = Form(...)):
-    """ตรวจสอบข้อความ"""
-    is_bad, bad_sentences = check_exaggeration(text)
+def check_web(text: str = Form(...), rulebooks: list[str] | None = Form(None)):
+    """ตรวจสอบข้อความ (ตรวจเฉพาะสมุดกฎที่เลือก ไม่เลือกเลย = กฎ อย. ทั้งหมด)"""
+    validate_rulebooks(rulebooks)
+    # ข้อความจากฟอร์มยาวไม่เกิน WEB_FORM_MAX_CHARS (ไม่ถึงเกณฑ์เอกสารยาว) แต่ยิงตรงด้วย multipart อาจยาวกว่านั้น
+    # จึงยังตัดด้วย cap_text เหมือน /check-url
+    text, truncated = cap_text(text)
+
+    # ตรวจ Rule-based + ขอคำอธิบายจาก AI (ถ้าเคยเห็นข้อความคล้ายๆ กัน จะยืมผลเดิม)
+    is_bad, bad_sentences, llm_result = check_with_reuse(text, rulebooks)
     
     # คำนวณคะแนนด้วยสูตรใหม่
     stats = calculate_ad_score(text, bad_sentences)
+    audit.record(text, bad_sentences, stats, rulebooks=rulebooks)
     score = stats['score']
     
     # กำหนดสีและคำตัดสิน
@@ -396,29 +394,21 @@ def check_web(text: str = Form(...)):
     </div>
     """
 
-    # LLM Logic
-    llm_result = ""
-    if is_bad and bad_sentences:
-        found_words = []
-        for item in bad_sentences:
-            found_words.extend(item["words"])
-        llm_result = explain_with_llm(text, found_words)
-
     # รายละเอียดจุดผิด
     detail_html = ""
     if is_bad and bad_sentences:
         for item in bad_sentences:
-            severity = item.get('severity', 'risk')
+            severity = item.severity
             icon = "❌" if severity == "violation" else "⚠️"
             bg_color = "#FEF2F2" if severity == "violation" else "#FFFBEB"
             border_color = "#EF4444" if severity == "violation" else "#F59E0B"
             
-            reasons = "".join([f"<li>{r}</li>" for r in item["reasons"]])
+            reasons = "".join([f"<li>{r}</li>" for r in item.reasons])
             
             detail_html += f"""
             <div style="background:{bg_color}; border-left:4px solid {border_color}; padding:15px; margin-bottom:10px; border-radius:6px;">
                 <div style="font-weight:bold; margin-bottom:5px; color:#1F2937; font-size:1.05rem;">
-                    {icon} {highlight_sentence(item["sentence"], item["words"])}
+                    {icon} {highlight_sentence(item.sentence, item.words)}
                 </div>
                 <ul style="color:#4B5563; font-size:0.95rem; margin:0; padding-left:20px;">{reasons}</ul>
             </div>
@@ -427,6 +417,7 @@ def check_web(text: str = Form(...)):
     safe_text_value = html.escape(text)
     content = f"""
     <a href="/" style="display:inline-block; margin-bottom:20px;">⬅️ กลับหน้าหลัก</a>
+    {truncated_notice(truncated)}
     {dashboard_html}
     {f'<div class="card"><h3>🔍 รายละเอียดจุดที่ต้องแก้ไข</h3>{detail_html}</div>' if detail_html else ''}
     <div class="card" style="border-top: 5px solid #4F46E5;">
@@ -442,15 +433,18 @@ def check_web(text: str = Form(...)):
 
 
 @app.post("/check-url", response_class=HTMLResponse)
-def check_url(url: str = Form(...)):
+def check_url(url: str = Form(...), rulebooks: list[str] | None = Form(None)):
     """ตรวจสอบ URL"""
+    validate_rulebooks(rulebooks)
     try:
         text = scrape_text(url)
         if not text or len(text.strip()) < 50:
             raise ValueError("ไม่พบข้อความ หรือข้อความสั้นเกินไป")
+        text, truncated = cap_text(text)
 
-        is_bad, bad_sentences = check_exaggeration(text)
+        is_bad, bad_sentences, llm_result = check_with_reuse(text, rulebooks)
         stats = calculate_ad_score(text, bad_sentences)
+        audit.record(text, bad_sentences, stats, url=url, rulebooks=rulebooks)
         
         score = stats['score']
         score_color = "#10B981" if score >= 80 else "#F59E0B" if score >= 50 else "#EF4444"
@@ -474,24 +468,17 @@ def check_url(url: str = Form(...)):
         </div>
         """
         
-        llm_result = ""
-        if is_bad and bad_sentences:
-            found_words = []
-            for item in bad_sentences:
-                found_words.extend(item["words"])
-            llm_result = explain_with_llm(text, found_words)
-
         detail_html = ""
         if is_bad and bad_sentences:
             for item in bad_sentences:
-                severity = item.get('severity', 'risk')
+                severity = item.severity
                 icon = "❌" if severity == "violation" else "⚠️"
                 bg_color = "#FEF2F2" if severity == "violation" else "#FFFBEB"
                 border_color = "#EF4444" if severity == "violation" else "#F59E0B"
-                reasons = "".join([f"<li>{r}</li>" for r in item["reasons"]])
+                reasons = "".join([f"<li>{r}</li>" for r in item.reasons])
                 detail_html += f"""
                 <div style="background:{bg_color}; border-left:4px solid {border_color}; padding:15px; margin-bottom:10px; border-radius:6px;">
-                    <div style="font-weight:bold; margin-bottom:5px; color:#1F2937;">{icon} {highlight_sentence(item["sentence"], item["words"])}</div>
+                    <div style="font-weight:bold; margin-bottom:5px; color:#1F2937;">{icon} {highlight_sentence(item.sentence, item.words)}</div>
                     <ul style="color:#4B5563; font-size:0.9rem; margin:0; padding-left:20px;">{reasons}</ul>
                 </div>
                 """
@@ -499,6 +486,7 @@ def check_url(url: str = Form(...)):
         safe_text_value = html.escape(text)
         content = f"""
         <a href="/" style="display:inline-block; margin-bottom:20px;">⬅️ กลับหน้าหลัก</a>
+        {truncated_notice(truncated)}
         {dashboard_html}
         {f'<div class="card"><h3>🔍 รายละเอียด</h3>{detail_html}</div>' if detail_html else ''}
         <div class="card">
@@ -547,4 +535,62 @@ def suggest(text: str = Form(...)):
         </div>
     </div>
     """
-    return get_base_html(content)
\ No newline at end of file
+    return get_base_html(content)
+
+
+class BatchRequest(BaseModel):
+    texts: list[str]
+    rulebooks: list[str] | None = None   # เช่น ["insurance"] (ไม่ระบุ = กฎ อย. ทั้งหมด)
+
+
+@app.post("/api/check-batch")
+def check_batch(req: BatchRequest):
+    """
+    API ตรวจข้อความหลายรายการพร้อมกัน (Rule-based อย่างเดียว ไม่เรียก AI)
+    ผลลัพธ์อ้างอิงกฎด้วยเลข id ส่วนคำ/เหตุผลอยู่ในตาราง "rules" ท้าย response
+    """
+    validate_rulebooks(req.rulebooks)
+    results = []
+    for text in req.texts:
+        text, _ = cap_text(text)
+        _, bad_sentences = check_exaggeration(text, req.rulebooks)
+        stats = calculate_ad_score(text, bad_sentences)
+        audit.record(text, bad_sentences, stats, rulebooks=req.rulebooks)
+        results.append((stats, bad_sentences))
+    return Response(content=encode_batch(results), media_type="application/json")
+
+
+@app.get("/api/audit/stats")
+def audit_stats(group_by: str = "rule", start: str | None = None, end: str | None = None,
+                domain: str | None = None, rule: str | None = None, limit: int = 50):
+    """
+    รายงานสรุปจากผลตรวจที่ผ่านมา (อ่านจากตารางสรุปรายวัน)
+    group_by: rule | category | domain | day, start/end: YYYY-MM-DD (ไม่ระบุ = 30 วันล่าสุด)
+    ตัวอย่าง: /api/audit/stats?group_by=rule&start=2026-10-01&end=2026-10-31
+    """
+    audit.flush()  # รวมรายการที่ยังค้างใน buffer ด้วย
+    try:
+        rows = audit.query_stats(group_by, start, end, domain, rule, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    start, end = audit.default_window(start, end)
+    return {"group_by": group_by, "start": start, "end": end, "rows": rows}
+
+
+@app.get("/api/audit/export")
+def audit_export(start: str | None = None, end: str | None = None,
+                 domain: str | None = None, format: str = "ndjson"):
+    """ส่งออกผลตรวจดิบในช่วงเวลาที่เลือก (format: ndjson | csv)"""
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format ต้องเป็น ndjson หรือ csv")
+    audit.flush()
+    try:
+        start, end = audit.default_window(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        audit.export_records(start, end, domain, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="audit_{start}_{end}.{format}"'},
+    )
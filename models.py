@@ -0,0 +1,129 @@
+import json
+import re
+from dataclasses import dataclass, field
+
+# ==============================================================================
+# 📦 โครงสร้างผลลัพธ์แบบประหยัดหน่วยความจำ (Compact Result Model)
+# ==============================================================================
+# เดิม: ทุกประโยคที่ผิดเป็น dict ที่ก๊อปข้อความเหตุผล (ภาษาไทยยาวๆ) ซ้ำทุกครั้ง
+# ใหม่: เก็บแค่ "เลขกฎ" (rule id) กับตำแหน่งในข้อความ (offset)
+#       ข้อความเหตุผลจะถูกดึงจากตารางกฎตอนแสดงผล/แปลงเป็น JSON เท่านั้น
+
+
+@dataclass(slots=True, frozen=True)
+class Rule:
+    """กฎ 1 ข้อ (สร้างครั้งเดียวตอนโหลดโมดูล แล้วอ้างอิงด้วยเลข id)"""
+    id: int
+    keyword: str
+    reason: str
+    severity: str                # 'violation' หรือ 'risk' ตามหมวดใน rules.py
+    score_violation: bool        # นับเป็น "ผิดกฎชัดเจน" ในการคำนวณคะแนนหรือไม่
+    pattern: re.Pattern | None = None  # None = คำตรงตัว, ไม่งั้นเป็น Pattern Rule (keyword คือชื่อที่แสดง)
+
+
+# ตารางกฎทั้งหมด (index ของ list = rule id)
+RULES: list[Rule] = []
+# คำ/ชื่อกฎ -> กฎเวอร์ชันล่าสุด (ใช้กับ rules.find_rule)
+RULES_BY_KEYWORD: dict[str, Rule] = {}
+# เนื้อหากฎ -> กฎที่ลงทะเบียนไว้แล้ว (โหลด rules.json ซ้ำ กฎที่ไม่ได้แก้ได้ id เดิม ตารางไม่โตขึ้นเรื่อยๆ)
+_RULES_BY_CONTENT: dict[tuple, Rule] = {}
+
+
+def register_rule(keyword: str, reason: str, severity: str, score_violation: bool,
+                  pattern: re.Pattern | None = None) -> Rule:
+    # ห้ามลบกฎออกจาก RULES (ผลตรวจที่ยังค้างอยู่อ้างถึงด้วยเลข id) จึงใช้ตัวเดิมแทนการเพิ่มใหม่
+    content = (keyword, reason, severity, score_violation, pattern.pattern if pattern else None)
+    rule = _RULES_BY_CONTENT.get(content)
+    if rule is None:
+        rule = Rule(len(RULES), keyword, reason, severity, score_violation, pattern)
+        RULES.append(rule)
+        _RULES_BY_CONTENT[content] = rule
+    RULES_BY_KEYWORD[keyword] = rule
+    return rule
+
+
+@dataclass(slots=True)
+class SentenceHit:
+    """
+    ประโยคที่ผิด 1 ประโยค
+    - start/end: ตำแหน่งของประโยคในข้อความต้นฉบับ
+    - rule_ids: เลขกฎที่เจอ (เรียงตามลำดับในฐานข้อมูล)
+    - spans: ตำแหน่งคำที่เจอ เก็บแบบแบน (start, end, start, end, ...) คู่ละ 1 กฎ
+    - violation: ผิดกฎชัดเจน (แดง) หรือแค่เสี่ยง (เหลือง)
+    ตัวข้อความ (text) ใช้ object เดียวกันทั้งเอกสาร ไม่ได้ก๊อปแยก
+    """
+    text: str = field(repr=False)
+    start: int
+    end: int
+    rule_ids: tuple[int, ...]
+    spans: tuple[int, ...]
+    violation: bool
+
+    @property
+    def sentence(self) -> str:
+        return self.text[self.start:self.end]
+
+    @property
+    def severity(self) -> str:
+        return "violation" if self.violation else "risk"
+
+    @property
+    def words(self) -> list[str]:
+        """คำที่เจอจริงในข้อความ (ตัดจากต้นฉบับตาม spans)"""
+        s = self.spans
+        return [self.text[s[i]:s[i + 1]] for i in range(0, len(s), 2)]
+
+    @property
+    def keywords(self) -> list[str]:
+        """คำในฐานข้อมูลที่ตรงกับประโยคนี้"""
+        return [RULES[i].keyword for i in self.rule_ids]
+
+    @property
+    def reasons(self) -> list[str]:
+        return [RULES[i].reason for i in self.rule_ids]
+
+    @property
+    def risk_categories(self) -> list[str]:
+        labels = []
+        for i in self.rule_ids:
+            label = "ผิดกฎร้ายแรง" if RULES[i].severity == "violation" else "โฆษณาเกินจริง"
+            if label not in labels:
+                labels.append(label)
+        return labels
+
+
+# ==============================================================================
+# 🧾 JSON Encoder สำหรับ Batch API
+# ==============================================================================
+# ประกอบ JSON เองจากตัวเลขล้วนๆ (เร็วกว่า json.dumps ทั้งก้อนหลายเท่า)
+# ข้อความที่เป็นภาษาไทย (คำ/เหตุผล) ใส่แค่ครั้งเดียวในตาราง "rules" ท้าย response
+
+def encode_batch(results) -> bytes:
+    """
+    results: list ของ (stats, hits) ต่อ 1 เอกสาร
+    รูปแบบ hit: [start, end, violation(0/1), [rule_id, ...], [span, ...]]
+    """
+    used_rules = set()
+    docs = []
+    for stats, hits in results:
+        hit_parts = []
+        for hit in hits:
+            used_rules.update(hit.rule_ids)
+            hit_parts.append(
+                f'[{hit.start},{hit.end},{int(hit.violation)},'
+                f'[{",".join(map(str, hit.rule_ids))}],[{",".join(map(str, hit.spans))}]]'
+            )
+        docs.append(
+            f'{{"score":{stats["score"]},"total":{stats["total"]},"pass":{stats["pass"]},'
+            f'"risk":{stats["risk"]},"violation":{stats["violation"]},"hits":[{",".join(hit_parts)}]}}'
+        )
+
+    rule_parts = []
+    for i in sorted(used_rules):
+        rule = RULES[i]
+        rule_parts.append(
+            f'"{i}":{json.dumps([rule.keyword, rule.reason, rule.severity], ensure_ascii=False)}'
+        )
+
+    body = f'{{"results":[{",".join(docs)}],"rules":{{{",".join(rule_parts)}}}}}'
+    return body.encode("utf-8")
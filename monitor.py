@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from models import RULES
+from rules import check_exaggeration
+from scraper import scrape_blocks
+from llm_explainer import explain_with_llm
+
+# ==============================================================================
+# 🛰️ URL MONITOR (เฝ้าดูหน้าเว็บผู้ขายแบบตั้งเวลา)
+# ==============================================================================
+# แนวคิด: ดึงหน้าเว็บซ้ำตามรอบเวลา แล้วแบ่งข้อความเป็น "บล็อก" (ประโยค)
+# เก็บ hash ของแต่ละบล็อกไว้ รอบถัดไปจะสแกนเฉพาะบล็อกที่ "ใหม่" เท่านั้น
+# และเรียก AI เฉพาะเมื่อเจอคำผิดกฎร้ายแรงที่เพิ่งปรากฏ -> ประหยัดทั้ง CPU และ Quota
+
+MONITOR_DIR = os.environ.get("MONITOR_DIR", "monitor_data")
+MONITOR_INTERVAL = int(os.environ.get("MONITOR_INTERVAL", "86400"))  # วินาที (ค่าเริ่มต้น: วันละครั้ง)
+MONITOR_WORKERS = int(os.environ.get("MONITOR_WORKERS", "8"))        # จำนวนเธรดที่ดึงเว็บพร้อมกัน
+MAX_HISTORY = 50                                                      # เก็บประวัติย้อนหลังต่อ URL
+
+_registry_lock = threading.Lock()
+
+
+# ==============================================================================
+# 💾 1. ที่เก็บข้อมูล (Local Storage)
+# ==============================================================================
+
+def _registry_path() -> str:
+    return os.path.join(MONITOR_DIR, "registry.json")
+
+
+def _state_path(url: str) -> str:
+    """ไฟล์สถานะของแต่ละ URL (ตั้งชื่อด้วย hash ของ URL กันอักขระแปลกๆ)"""
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(MONITOR_DIR, f"{name}.json")
+
+
+def _load_json(path: str, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def _save_json(path: str, data):
+    """เขียนไฟล์แบบ atomic (เขียนไฟล์ชั่วคราวแล้วค่อย rename) กันไฟล์พังตอนเครื่องดับ"""
+    os.makedirs(MONITOR_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def list_urls() -> list[str]:
+    return _load_json(_registry_path(), {"urls": []})["urls"]
+
+
+def add_url(url: str) -> bool:
+    """ลงทะเบียน URL ที่ต้องการเฝ้าดู (คืน False ถ้ามีอยู่แล้ว)"""
+    with _registry_lock:
+        urls = list_urls()
+        if url in urls:
+            return False
+        urls.append(url)
+        _save_json(_registry_path(), {"urls": urls})
+        return True
+
+
+def remove_url(url: str) -> bool:
+    """ยกเลิกการเฝ้าดู URL (ประวัติเดิมยังเก็บไว้)"""
+    with _registry_lock:
+        urls = list_urls()
+        if url not in urls:
+            return False
+        urls.remove(url)
+        _save_json(_registry_path(), {"urls": urls})
+        return True
+
+
+def load_state(url: str) -> dict:
+    """โหลดสถานะล่าสุดของ URL (บล็อกที่เคยเห็น + ประวัติการเปลี่ยนแปลง)"""
+    return _load_json(_state_path(url), {
+        "url": url,
+        "page_hash": None,   # hash ของทั้งหน้า (ถ้าไม่เปลี่ยนเลย ข้ามได้ทันที)
+        "blocks": {},        # block_hash -> รายการคำผิดในบล็อกนั้น ([] = ผ่าน)
+        "history": [],
+    })
+
+
+# ==============================================================================
+# 🧱 2. แบ่งบล็อกและ Hash (Block-level Change Detection)
+# ==============================================================================
+
+def _hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def split_blocks(blocks: list[str]) -> dict[str, str]:
+    """
+    Hash บล็อกเนื้อหาจาก scrape_blocks (แบ่งตามแท็ก p/li/div/หัวข้อ ของหน้าเว็บ)
+    คืนค่า: {block_hash: block_text} (บล็อกซ้ำในหน้าเดียวกันจะถูกรวมเป็นอันเดียว)
+    """
+    return {_hash(block): block for block in blocks}
+
+
+def _scan_block(block: str) -> list[dict]:
+    """
+    สแกนบล็อกเดียวด้วย Rule-based แล้วเก็บเฉพาะข้อมูลที่จำเป็น
+    (เก็บคำในฐานข้อมูลแทนเหตุผล เหตุผลค่อยดึงจาก rules.ALL_RULES ตอนแสดงผล)
+    """
+    _, bad_sentences = check_exaggeration(block)
+    return [
+        {
+            "sentence": item.sentence,
+            "words": item.keywords,
+            "violation": any(RULES[i].severity == "violation" for i in item.rule_ids),
+        }
+        for item in bad_sentences
+    ]
+
+
+# ==============================================================================
+# 🔁 3. ตรวจสอบรอบเดียว (Single Check)
+# ==============================================================================
+
+def check_url_once(url: str, use_llm: bool = True) -> dict:
+    """
+    ดึงหน้าเว็บ 1 ครั้ง แล้วเทียบกับสถานะเดิม
+    - บล็อกที่ไม่เปลี่ยน: ใช้ผลเดิม ไม่สแกนซ้ำ
+    - บล็อกใหม่/ที่ถูกแก้: สแกนด้วย check_exaggeration
+    - เรียก AI เฉพาะเมื่อบล็อกใหม่มีคำผิดกฎร้ายแรง (violation)
+    คืนค่า: รายการประวัติ (diff) ของรอบนี้
+    """
+    state = load_state(url)
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    page_blocks = scrape_blocks(url)
+    if not page_blocks:
+        entry = {"checked_at": now, "status": "fetch_failed"}
+        _append_history(state, entry)
+        _save_json(_state_path(url), state)
+        return entry
+
+    # ทางลัด: ถ้าทั้งหน้าเหมือนเดิมทุกตัวอักษร ไม่ต้องแบ่งบล็อกเลย
+    page_hash = _hash("\n".join(page_blocks))
+    if page_hash == state["page_hash"]:
+        entry = {"checked_at": now, "status": "unchanged"}
+        _append_history(state, entry)
+        _save_json(_state_path(url), state)
+        return entry
+
+    old_blocks = state["blocks"]
+    new_blocks = split_blocks(page_blocks)
+
+    added = [h for h in new_blocks if h not in old_blocks]
+    removed = [h for h in old_blocks if h not in new_blocks]
+
+    # สแกนเฉพาะบล็อกที่เพิ่งปรากฏ ส่วนบล็อกเดิมยกผลเก่ามาใช้
+    blocks = {h: old_blocks[h] for h in new_blocks if h in old_blocks}
+    new_hits = []
+    for h in added:
+        hits = _scan_block(new_blocks[h])
+        blocks[h] = hits
+        new_hits.extend(hits)
+
+    # คัดเฉพาะคำผิดกฎร้ายแรงที่เพิ่งเกิด -> ส่งให้ AI อธิบาย
+    new_violations = [hit for hit in new_hits if hit["violation"]]
+    explanation = ""
+    if use_llm and new_violations:
+        found_words = []
+        for hit in new_violations:
+            found_words.extend(w for w in hit["words"] if w not in found_words)
+        violation_text = "\n".join(hit["sentence"] for hit in new_violations)
+        explanation = explain_with_llm(violation_text, found_words)
+
+    state["page_hash"] = page_hash
+    state["blocks"] = blocks
+    entry = {
+        "checked_at": now,
+        "status": "changed",
+        "added": len(added),
+        "removed": len(removed),
+        "new_hits": new_hits,
+        "new_violations": len(new_violations),
+        "explanation": explanation,
+    }
+    _append_history(state, entry)
+    _save_json(_state_path(url), state)
+    return entry
+
+
+def _append_history(state: dict, entry: dict):
+    state["history"].append(entry)
+    del state["history"][:-MAX_HISTORY]
+
+
+# ==============================================================================
+# ⏰ 4. ตัวตั้งเวลา (Scheduler)
+# ==============================================================================
+
+def run_once(use_llm: bool = True) -> dict[str, dict]:
+    """ตรวจทุก URL ที่ลงทะเบียนไว้ 1 รอบ (ดึงเว็บหลายเธรดพร้อมกัน)"""
+    urls = list_urls()
+    results = {}
+
+    def _safe_check(url):
+        try:
+            return check_url_once(url, use_llm=use_llm)
+        except Exception as e:
+            # URL เดียวพัง ไม่ควรทำให้ทั้งรอบหยุด
+            return {"status": "error", "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=MONITOR_WORKERS) as pool:
+        for url, entry in zip(urls, pool.map(_safe_check, urls)):
+            results[url] = entry
+    return results
+
+
+def run_forever(interval: int = MONITOR_INTERVAL, use_llm: bool = True):
+    """วนตรวจตามรอบเวลาไปเรื่อยๆ (กด Ctrl+C เพื่อหยุด)"""
+    while True:
+        started = time.monotonic()
+        results = run_once(use_llm=use_llm)
+        changed = sum(1 for r in results.values() if r.get("status") == "changed")
+        violations = sum(r.get("new_violations", 0) for r in results.values())
+        print(f"🛰️ ตรวจ {len(results)} URL | เปลี่ยนแปลง {changed} | คำผิดกฎใหม่ {violations}")
+
+        elapsed = time.monotonic() - started
+        time.sleep(max(0, interval - elapsed))
+
+
+# ==============================================================================
+# 🖥️ 5. คำสั่งผ่าน Command Line
+# ==============================================================================
+# python monitor.py add https://shop.example.com/product
+# python monitor.py remove https://shop.example.com/product
+# python monitor.py list
+# python monitor.py once          (ตรวจ 1 รอบ)
+# python monitor.py run [วินาที]   (ตรวจตามรอบเวลาไปเรื่อยๆ)
+# python monitor.py history https://shop.example.com/product
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "list"
+
+    if command == "add" and len(args) == 2:
+        print("✅ เพิ่มแล้ว" if add_url(args[1]) else "ℹ️ มี URL นี้อยู่แล้ว")
+    elif command == "remove" and len(args) == 2:
+        print("✅ ลบแล้ว" if remove_url(args[1]) else "ℹ️ ไม่พบ URL นี้")
+    elif command == "list":
+        for u in list_urls():
+            print(u)
+    elif command == "once":
+        print(json.dumps(run_once(), ensure_ascii=False, indent=2))
+    elif command == "run":
+        run_forever(int(args[1]) if len(args) > 1 else MONITOR_INTERVAL)
+    elif command == "history" and len(args) == 2:
+        print(json.dumps(load_state(args[1])["history"], ensure_ascii=False, indent=2))
+    else:
+        print("วิธีใช้: python monitor.py [add URL | remove URL | list | once | run [วินาที] | history URL]")
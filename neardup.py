@@ -0,0 +1,364 @@
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from normalize import normalize
+from rules import DEFAULT_RULEBOOKS, LARGE_DOC_THRESHOLD, find_rule, get_matcher, scan_clean_text, scan_sentence, split_with_patterns
+from llm_explainer import explain_with_llm
+
+# ==============================================================================
+# ♻️ NEAR-DUPLICATE INDEX (จำผลตรวจของโฆษณาที่ "เกือบซ้ำ" กับของเดิม)
+# ==============================================================================
+# ผู้ขายมักโพสต์ข้อความเดิมซ้ำโดยแก้นิดหน่อย (ราคา, อีโมจิ, ชื่อร้าน)
+# ใช้ SimHash 64 บิต: ข้อความที่คล้ายกันจะได้ค่า hash ที่ต่างกันแค่ไม่กี่บิต
+# ถ้าเจอของเดิมที่ใกล้พอ -> ยืมคำอธิบายจาก AI มาใช้ แล้วสแกน/อธิบายเฉพาะประโยคที่ต่าง
+#
+# การค้นหาเร็วระดับ sub-millisecond: แบ่ง hash เป็น 4 ท่อน (band) ท่อนละ 16 บิต
+# ถ้าต่างกันไม่เกิน 3 บิต จะต้องมีอย่างน้อย 1 ท่อนที่ตรงกันเป๊ะ (Pigeonhole)
+# จึงค้นแค่ 4 dict lookup แทนการไล่เทียบทุกรายการ
+
+NEARDUP_PATH = os.environ.get("NEARDUP_PATH", "neardup_index.json.gz")
+NEARDUP_MAX_ENTRIES = int(os.environ.get("NEARDUP_MAX_ENTRIES", "200000"))  # จำกัดหน่วยความจำ
+NEARDUP_MAX_DISTANCE = 3   # จำนวนบิตที่ต่างกันได้มากสุด (ต้องน้อยกว่าจำนวน band)
+SHINGLE_SIZE = 4           # ความยาว n-gram ตัวอักษร (ภาษาไทยไม่มีช่องว่างระหว่างคำ)
+SIMHASH_MAX_CHARS = 20000  # ใช้ตัวอักษรแรกกี่ตัวทำ SimHash (กันข้อความยาวมากกินเวลา)
+SAVE_EVERY = 500           # บันทึกลงดิสก์ทุกๆ กี่รายการใหม่
+SAVE_SECONDS = float(os.environ.get("NEARDUP_SAVE_SECONDS", "30"))  # หรือทุกกี่วินาที
+COMPACT_MIN_BYTES = 8 * 1024 * 1024  # บันทึกต่อท้ายเล็กกว่านี้ยังไม่ต้องรวม snapshot
+
+_NON_LETTERS = re.compile(r"[^\u0E01-\u0E4Ea-z]+")
+_BANDS = 4
+_BAND_BITS = 64 // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+
+# ==============================================================================
+# 🔢 1. SimHash
+# ==============================================================================
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> int:
+    """
+    คำนวณ SimHash 64 บิตจาก n-gram ตัวอักษร
+    เก็บไว้เฉพาะตัวอักษรไทย/อังกฤษ (ตัดช่องว่าง ตัวเลข อีโมจิ และสัญลักษณ์ทิ้ง)
+    เพื่อให้การแก้ราคาหรือเติมอีโมจิไม่ทำให้ hash เปลี่ยน
+    ข้อความยาวมากใช้แค่ SIMHASH_MAX_CHARS ตัวอักษรแรก (ประโยคที่ต่างหลังจากนั้นยังถูกสแกนครบตอนยืมผล)
+    """
+    compact = _NON_LETTERS.sub("", text.lower())[:SIMHASH_MAX_CHARS]
+    if len(compact) <= SHINGLE_SIZE:
+        shingles = {compact}
+    else:
+        shingles = {compact[i:i + SHINGLE_SIZE] for i in range(len(compact) - SHINGLE_SIZE + 1)}
+
+    # นับบิตทุก shingle พร้อมกันด้วย numpy: (จำนวน shingle x 64 บิต) -> ผลรวมแต่ละคอลัมน์
+    digests = b"".join(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, 64)
+    ones = bits.sum(axis=0, dtype=np.int64)
+    # บิตที่ 1 มากกว่า 0 (ones > จำนวน - ones) -> บิตนั้นเป็น 1 (unpackbits เรียงจากบิตสูงสุดลงมา)
+    return int.from_bytes(np.packbits(ones * 2 > len(shingles)).tobytes(), "big")
+
+
+def _bands(value: int):
+    for i in range(_BANDS):
+        yield i, (value >> (i * _BAND_BITS)) & _BAND_MASK
+
+
+# ==============================================================================
+# 🗂️ 2. ดัชนี (Index)
+# ==============================================================================
+
+class NearDupIndex:
+    """
+    ดัชนีเก็บผลตรวจเดิม ค้นหาด้วย SimHash
+    - จำกัดจำนวนรายการ (LRU): เต็มเมื่อไหร่ ลบรายการที่ไม่ได้ใช้นานสุดทิ้ง
+    - บันทึกลงดิสก์จากเธรดพื้นหลัง (ไม่กินเวลาคำขอ):
+      รายการใหม่เขียนต่อท้าย path + ".log" ทีละก้อน (gzip member แบบเดียวกับ audit.py)
+      แล้วค่อยรวมเป็น snapshot (gzip + JSON) เมื่อบันทึกต่อท้ายโตกว่า snapshot
+    """
+
+    def __init__(self, max_entries: int = NEARDUP_MAX_ENTRIES, max_distance: int = NEARDUP_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        # simhash -> {"sentences": [hash ของทุกประโยค], "hits": {sentence_hash: [คำที่เจอ]},
+        #             "rulebooks": [...], "rules_version": str, "explanation": str}
+        self.entries = OrderedDict()
+        self.bands = [dict() for _ in range(_BANDS)]   # ค่าในแต่ละ band -> set ของ simhash
+        self.pending = []   # รายการใหม่ที่ยังไม่ได้เขียนลงดิสก์
+        self.lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, value: int):
+        """คืนค่า (simhash, entry) ที่ใกล้ที่สุด หรือ None ถ้าไม่มีตัวไหนใกล้พอ"""
+        with self.lock:
+            best = None
+            best_distance = self.max_distance + 1
+            for i, band in _bands(value):
+                for candidate in self.bands[i].get(band, ()):
+                    distance = (candidate ^ value).bit_count()
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+            if best is None:
+                return None
+            self.entries.move_to_end(best)  # เพิ่งถูกใช้ -> ย้ายไปท้าย LRU
+            return best, self.entries[best]
+
+    def add(self, value: int, entry: dict, persist: bool = True):
+        with self.lock:
+            if value in self.entries:
+                self.entries.move_to_end(value)
+            else:
+                for i, band in _bands(value):
+                    self.bands[i].setdefault(band, set()).add(value)
+            self.entries[value] = entry
+
+            while len(self.entries) > self.max_entries:
+                old_value, _ = self.entries.popitem(last=False)
+                for i, band in _bands(old_value):
+                    bucket = self.bands[i][band]
+                    bucket.discard(old_value)
+                    if not bucket:
+                        del self.bands[i][band]
+            if persist and value in self.entries:  # max_entries=0 -> ไม่จำอะไรเลย
+                self.pending.append((value, entry))
+                due = len(self.pending) >= SAVE_EVERY
+            else:
+                due = False
+        if due:
+            self._wake.set()  # ปลุกเธรดพื้นหลังให้เขียน (คำขอไม่ต้องรอ)
+
+    def flush(self, path: str = NEARDUP_PATH):
+        """เขียนรายการใหม่ต่อท้ายบันทึก (ครั้งละก้อนเดียว งานต่อคำขอไม่ขึ้นกับขนาดดัชนี)"""
+        with self._write_lock:
+            with self.lock:
+                pending, self.pending = self.pending, []
+            if not pending:
+                return
+            lines = "".join(json.dumps([value, entry], ensure_ascii=False) + "\n" for value, entry in pending)
+            data = gzip.compress(lines.encode("utf-8"))
+            # หลาย process เขียนต่อท้ายพร้อมกันได้ (write ครั้งเดียวต่อก้อน) แต่ห้ามชนกับตอนรวม snapshot
+            with _file_lock(path, exclusive=False), open(path + ".log", "ab") as f:
+                f.write(data)
+
+    def load(self, path: str = NEARDUP_PATH):
+        """โหลด snapshot แล้วตามด้วยบันทึกต่อท้าย (รายการที่ใหม่กว่าทับของเก่า)"""
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, OSError, json.JSONDecodeError, EOFError):
+            data = []
+        for value, entry in data:
+            self._load_entry(value, entry)
+
+        try:
+            with gzip.open(path + ".log", "rt", encoding="utf-8") as f:
+                for line in f:
+                    self._load_entry(*json.loads(line))
+        except FileNotFoundError:
+            pass
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+            pass  # ก้อนท้ายเขียนไม่จบ (เครื่องดับกลางทาง) ใช้ได้ถึงก้อนก่อนหน้า
+
+    def _load_entry(self, value: int, entry: dict):
+        # JSON เก็บ key ของ dict เป็น string ต้องแปลงกลับเป็น int
+        entry["hits"] = {int(h): item for h, item in entry["hits"].items()}
+        self.add(value, entry, persist=False)
+
+    def start_saver(self, path: str = NEARDUP_PATH):
+        """เธรดพื้นหลัง: เขียนทุก SAVE_EVERY รายการ (หรือทุก SAVE_SECONDS วินาที) แล้วรวม snapshot เมื่อถึงเวลา"""
+        def _run():
+            while True:
+                self._wake.wait(SAVE_SECONDS)
+                self._wake.clear()
+                try:
+                    self.flush(path)
+                    if _needs_compaction(path):
+                        compact(path, self.max_entries)
+                except OSError as e:
+                    print(f"⚠️ บันทึก near-dup index ไม่สำเร็จ: {e}")
+
+        threading.Thread(target=_run, name="neardup-saver", daemon=True).start()
+
+
+@contextmanager
+def _file_lock(path: str, exclusive: bool):
+    """ล็อกข้าม process (ใช้ร่วมกันได้ตอนเขียนต่อท้าย / ใช้คนเดียวตอนรวม snapshot)"""
+    if fcntl is None:  # Windows: ไม่มี flock (รันเครื่องเดียว process เดียว)
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _needs_compaction(path: str) -> bool:
+    try:
+        log_size = os.path.getsize(path + ".log")
+    except OSError:
+        return False
+    try:
+        snapshot_size = os.path.getsize(path)
+    except OSError:
+        snapshot_size = 0
+    return log_size > max(snapshot_size, COMPACT_MIN_BYTES)
+
+
+def compact(path: str = NEARDUP_PATH, max_entries: int = NEARDUP_MAX_ENTRIES):
+    """
+    รวม snapshot + บันทึกต่อท้าย เป็น snapshot ใหม่ แล้วล้างบันทึกต่อท้าย
+    อ่านจากดิสก์ (ไม่ใช่จากหน่วยความจำ) จึงได้รายการของทุก process ครบ
+    """
+    with _file_lock(path, exclusive=True):
+        merged = NearDupIndex(max_entries=max_entries)
+        merged.load(path)
+        data = [[value, entry] for value, entry in merged.entries.items()]
+        # ไฟล์ชั่วคราวชื่อไม่ซ้ำกัน แล้วสลับเข้าที่ทีเดียว (ไม่มีใครเห็นไฟล์ที่เขียนไม่จบ)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                        prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        open(path + ".log", "wb").close()
+
+
+index = NearDupIndex()
+index.load()
+index.start_saver()
+atexit.register(index.flush)
+
+
+# ==============================================================================
+# 🚀 3. ตรวจแบบยืมผลเดิม (Check with Reuse)
+# ==============================================================================
+
+def _explain(text: str, bad_sentences) -> str:
+    """ขอคำอธิบายจาก AI สำหรับทั้งข้อความ (ไม่เจอคำผิด = ไม่ต้องเรียก)"""
+    if not bad_sentences:
+        return ""
+    # ส่งคำที่เจอจริงให้ AI (ไม่ใช่ชื่อกฎอย่าง "INS-01") คำละครั้ง เอกสารยาวจะได้ไม่ส่งคำเดิมซ้ำเป็นพันๆ รอบ
+    found_words = list(dict.fromkeys(word for item in bad_sentences for word in item.words))
+    return explain_with_llm(text, found_words)
+
+
+def check_with_reuse(text: str, rulebooks=None):
+    """
+    ใช้แทน check_exaggeration + explain_with_llm
+    Input: ข้อความ, สมุดกฎที่เลือก (ส่งต่อให้ check_exaggeration)
+    Output: (is_bad, bad_sentences, llm_result)
+
+    - ไม่เคยเห็นข้อความคล้ายๆ กันมาก่อน -> ตรวจเต็มรูปแบบ แล้วจำไว้
+    - เคยเห็นแล้ว -> สแกนเฉพาะประโยคที่ต่างจากของเดิม
+      ยืมคำอธิบายเดิมได้เมื่อคำที่คำอธิบายเดิมพูดถึงยังอยู่ครบ (ไม่งั้นขอคำอธิบายใหม่)
+      และเรียก AI เพิ่มเฉพาะเมื่อประโยคที่ต่างมีคำผิดใหม่ที่คำอธิบายเดิมยังไม่ครอบคลุม
+    - ยาวเกิน LARGE_DOC_THRESHOLD -> ตรวจเต็มแบบหลาย process เสมอ ไม่จำ/ไม่ยืมผล
+    """
+    # ตรวจบนข้อความที่ล้างเทคนิคหลบคำแล้ว (เหมือน check_exaggeration) แล้วแปลงตำแหน่งกลับ
+    norm = normalize(text)
+    clean = norm.text
+    matcher = get_matcher(rulebooks)
+    if len(clean) >= LARGE_DOC_THRESHOLD:
+        # เอกสารยาวมาก: ไม่ยืมผล (hash ทุกประโยค + สแกนทีละประโยคบนเธรดคำขอ ช้ากว่าสแกนใหม่แบบหลาย process)
+        # และเอกสารขนาดนี้แทบไม่เคยเกือบซ้ำกับของเดิมอยู่แล้ว
+        bad_sentences = [norm.remap_hit(item) for item in scan_clean_text(clean, matcher)]
+        return bool(bad_sentences), bad_sentences, _explain(text, bad_sentences)
+
+    spans, pattern_hits = split_with_patterns(clean, matcher)
+    sentence_hashes = [_hash64(clean[start:end]) for start, end in spans]
+    value = simhash(text)
+    rulebook_key = sorted(set(rulebooks or DEFAULT_RULEBOOKS))
+    match = index.lookup(value)
+    if match is not None and (match[1].get("rulebooks", sorted(DEFAULT_RULEBOOKS)) != rulebook_key
+                              or match[1].get("rules_version") != matcher.version):
+        match = None  # ตรวจด้วยสมุดกฎคนละชุด หรือกฎถูกแก้ไขหลังจำผลไว้ ยืมผลกันไม่ได้
+
+    if match is None:
+        # ตรวจเต็มรูปแบบ (เหมือน check_exaggeration)
+        clean_hits = scan_clean_text(clean, matcher)
+        # จำเป็นคำในฐานข้อมูล (ไม่ใช่เลข id) เพราะเลข id อาจเปลี่ยนเมื่อแก้ไขกฎ
+        hits_by_sentence = {_hash64(item.sentence): item.keywords for item in clean_hits}
+        bad_sentences = [norm.remap_hit(item) for item in clean_hits]
+        is_bad = bool(bad_sentences)
+        llm_result = _explain(text, bad_sentences)
+    else:
+        _, cached = match
+        known_sentences = set(cached["sentences"])
+        cached_words = {w for keywords in cached["hits"].values() for w in keywords}
+
+        # Pattern Rules ใช้ผลจาก regex ก้อนรวม (ผลเหมือนตรวจเต็มรูปแบบทุกประการ)
+        # กฎคำตรงตัว: ประโยคที่เคยเห็นตรวจเฉพาะคำที่เคยเจอ (เพื่อหาตำแหน่งในข้อความใหม่), ประโยคที่ไม่เคยเห็นตรวจทุกคำ
+        bad_sentences = []
+        hits_by_sentence = {}
+        new_items = []
+        for idx, ((start, end), h) in enumerate(zip(spans, sentence_hashes)):
+            if h in known_sentences:
+                keywords = cached["hits"].get(h)
+                if not keywords:
+                    continue
+                rules = [rule for rule in map(find_rule, keywords) if rule is not None and rule.pattern is None]
+            else:
+                rules = matcher.literal_rules
+            hit = scan_sentence(clean, start, end, rules, pattern_hits.get(idx, ()))
+            if hit:
+                if h not in known_sentences and h not in hits_by_sentence:
+                    new_items.append(hit)
+                hits_by_sentence[h] = hit.keywords
+                bad_sentences.append(norm.remap_hit(hit))
+
+        is_bad = bool(bad_sentences)
+        current_words = {w for keywords in hits_by_sentence.values() for w in keywords}
+        if not is_bad:
+            llm_result = ""
+        elif not cached_words <= current_words:
+            # คำที่คำอธิบายเดิมพูดถึงหายไปบางคำ (ประโยคถูกแก้/ลบ) -> คำอธิบายเดิมใช้ไม่ได้ ขอใหม่ทั้งข้อความ
+            llm_result = _explain(text, bad_sentences)
+        else:
+            # คำอธิบายเดิมยังตรง: เรียก AI เพิ่มเฉพาะคำผิดที่คำอธิบายเดิมยังไม่พูดถึง
+            llm_result = cached["explanation"]
+            new_words = []
+            for item in new_items:
+                for keyword, word in zip(item.keywords, item.words):
+                    if keyword not in cached_words and word not in new_words:
+                        new_words.append(word)
+            if new_words:
+                extra_text = "\n".join(item.sentence for item in new_items)
+                extra = explain_with_llm(extra_text, new_words)
+                llm_result = f"{llm_result}\n\n{extra}" if llm_result else extra
+
+    # จำผลไว้ใช้ครั้งหน้า (ไม่จำคำตอบที่ AI ขัดข้อง จะได้ลองใหม่รอบหน้า)
+    if not llm_result.startswith("⚠️"):
+        index.add(value, {
+            "sentences": sentence_hashes,
+            "hits": hits_by_sentence,
+            "rulebooks": rulebook_key,
+            "rules_version": matcher.version,
+            "explanation": llm_result,
+        })
+
+    return is_bad, bad_sentences, llm_result
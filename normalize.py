@@ -0,0 +1,149 @@
+import re
+import time
+from bisect import bisect_right
+
+from models import SentenceHit
+
+# ==============================================================================
+# 🧽 TEXT NORMALIZATION (ล้างเทคนิคหลบคำต้องห้ามก่อนสแกน)
+# ==============================================================================
+# ผู้ขายชอบเลี่ยงการตรวจจับด้วย:
+# - ใส่ตัวอักษรล่องหน (zero-width space) แทรกกลางคำ      เช่น "หาย<ZWSP>ขาด"
+# - เว้นวรรคทีละตัว                                      เช่น "ห า ย ข า ด"
+# - ใช้ตัวเลข/สัญลักษณ์แบบเต็มความกว้าง หรือเลขไทย         เช่น "１００％", "๑๐๐%"
+# - พิมพ์วรรณยุกต์ซ้ำ                                      เช่น "ที่่่สุด" (-> "ที่สุด")
+#
+# ขั้นตอน (ทำครั้งเดียวต่อข้อความ ทุกขั้นวิ่งใน regex engine ที่เป็น C ไม่วนลูป Python ทีละตัวอักษร):
+# 1. แทนที่ตัวอักษรตามตารางที่เตรียมไว้ล่วงหน้า (1 ตัวต่อ 1 ตัว ตำแหน่งไม่เลื่อน)
+#    แทนเฉพาะจุดที่เจอ ข้อความปกติที่ไม่มีตัวอักษรพวกนี้จะข้ามไปเลย
+# 2. หาตัวอักษรที่ต้อง "ตัดทิ้ง" แล้วต่อชิ้นส่วนที่เหลือ
+# 3. เก็บจุดเปลี่ยนตำแหน่ง (breakpoints) ไว้แปลงตำแหน่งกลับไปหาข้อความต้นฉบับ
+#    -> ไฮไลท์/ตำแหน่งที่รายงาน ยังชี้ไปที่สิ่งที่ผู้ใช้พิมพ์จริง
+
+# 1. ตารางแปลงตัวอักษร (สร้างครั้งเดียวตอนโหลดโมดูล)
+_TRANSLATE_TABLE = {
+    **{chr(code): chr(code - 0xFEE0) for code in range(0xFF01, 0xFF5F)},  # ！-～ เต็มความกว้าง -> ASCII
+    **{chr(0x0E50 + i): str(i) for i in range(10)},                      # เลขไทย ๐-๙ -> 0-9
+    "\u3000": " ",                                                       # ช่องว่างเต็มความกว้าง
+    "\u00A0": " ",                                                       # non-breaking space
+}
+_TRANSLATE_PATTERN = re.compile(r"[\uFF01-\uFF5E\u0E50-\u0E59\u3000\u00A0]")
+
+# 2. ตัวอักษรที่ต้องตัดทิ้ง
+_THAI = r"\u0E01-\u0E4E"
+# ตัวอักษรล่องหน (zero-width space/joiner, word joiner, BOM, soft hyphen)
+_INVISIBLE_PATTERN = re.compile(r"[\u200B-\u200D\u2060\uFEFF\u00AD]+")
+# วรรณยุกต์/สระบนล่างซ้ำติดกัน (เก็บตัวแรก ตัดตัวที่ซ้ำ)
+_REPEATED_MARK_PATTERN = re.compile(r"([\u0E31\u0E34-\u0E3A\u0E47-\u0E4E])(\1+)")
+# ตัวอักษรไทยที่เว้นวรรคทีละ 1-2 ตัว ติดกันตั้งแต่ 3 ชิ้นขึ้นไป (ตัดช่องว่างระหว่างชิ้น)
+_SPACED_PATTERN = re.compile(rf"(?<![{_THAI}])[{_THAI}]{{1,2}}(?: [{_THAI}]{{1,2}}){{2,}}(?![{_THAI}])")
+_SPACE_PATTERN = re.compile(" ")
+
+
+class NormalizedText:
+    """
+    ข้อความหลังล้าง + แผนที่ตำแหน่งกลับไปยังต้นฉบับ
+    เก็บแบบประหยัด: จดเฉพาะจุดเริ่มของแต่ละชิ้นที่ต่อกัน (ไม่ได้จดทุกตัวอักษร)
+    """
+    __slots__ = ("text", "original", "_norm_starts", "_orig_starts")
+
+    def __init__(self, text: str, original: str, norm_starts: list[int], orig_starts: list[int]):
+        self.text = text
+        self.original = original
+        self._norm_starts = norm_starts
+        self._orig_starts = orig_starts
+
+    @property
+    def changed(self) -> bool:
+        return self.text != self.original
+
+    def to_original(self, pos: int) -> int:
+        """แปลงตำแหน่งตัวอักษรในข้อความที่ล้างแล้ว -> ตำแหน่งในต้นฉบับ"""
+        if not self._norm_starts:
+            return pos
+        i = bisect_right(self._norm_starts, pos) - 1
+        return self._orig_starts[i] + (pos - self._norm_starts[i])
+
+    def span_to_original(self, start: int, end: int) -> tuple[int, int]:
+        """แปลงช่วง [start, end) (end แปลงจากตัวสุดท้าย เพื่อไม่ให้กินตัวที่ถูกตัดทิ้งท้ายช่วง)"""
+        if start >= end:
+            pos = self.to_original(start)
+            return pos, pos
+        return self.to_original(start), self.to_original(end - 1) + 1
+
+    def remap_hit(self, hit: SentenceHit) -> SentenceHit:
+        """แปลงผลตรวจที่ได้จากข้อความที่ล้างแล้ว ให้ชี้กลับไปที่ข้อความต้นฉบับ"""
+        if not self._norm_starts:
+            hit.text = self.original
+            return hit
+        start, end = self.span_to_original(hit.start, hit.end)
+        spans = []
+        s = hit.spans
+        for i in range(0, len(s), 2):
+            spans.extend(self.span_to_original(s[i], s[i + 1]))
+        return SentenceHit(self.original, start, end, hit.rule_ids, tuple(spans), hit.violation)
+
+
+def normalize(text: str) -> NormalizedText:
+    """ล้างข้อความก่อนสแกน (ดูคำอธิบายด้านบน)"""
+    translated = _TRANSLATE_PATTERN.sub(lambda m: _TRANSLATE_TABLE[m.group()], text)
+
+    # หาช่วงที่ต้องตัดทิ้ง (ช่วงจากแต่ละแบบไม่ทับกัน เรียงรวมกันได้เลย)
+    drops = [m.span() for m in _INVISIBLE_PATTERN.finditer(translated)]
+    drops.extend(m.span(2) for m in _REPEATED_MARK_PATTERN.finditer(translated))
+    for m in _SPACED_PATTERN.finditer(translated):
+        drops.extend(space.span() for space in _SPACE_PATTERN.finditer(translated, m.start(), m.end()))
+    drops.sort()
+
+    # ทางลัด: ไม่มีอะไรต้องตัด ตำแหน่งตรงกันทุกตัว
+    if not drops:
+        return NormalizedText(translated, text, [], [])
+
+    pieces = []
+    norm_starts = []
+    orig_starts = []
+    norm_pos = 0
+    orig_pos = 0
+    for drop_start, drop_end in drops:
+        if drop_start > orig_pos:
+            norm_starts.append(norm_pos)
+            orig_starts.append(orig_pos)
+            pieces.append(translated[orig_pos:drop_start])
+            norm_pos += drop_start - orig_pos
+        orig_pos = drop_end
+    if orig_pos < len(translated):
+        norm_starts.append(norm_pos)
+        orig_starts.append(orig_pos)
+        pieces.append(translated[orig_pos:])
+
+    return NormalizedText("".join(pieces), text, norm_starts, orig_starts)
+
+
+# ==============================================================================
+# ⏱️ Benchmark: python normalize.py
+# ==============================================================================
+# วัดเวลาที่เพิ่มขึ้นจากการล้างข้อความ เทียบกับเวลาสแกนทั้งหมด บนหน้าเว็บยาวๆ
+
+if __name__ == "__main__":
+    from rules import check_exaggeration
+
+    clean_block = "ครีมบำรุงผิวสูตรใหม่ ใช้ง่าย ซึมไว ส่งฟรีทั่วประเทศ. "
+    dirty_block = "ห า ย ข า ด ใน ๗ วัน เห็น\u200bผลจริง １００％ ดีที่่่สุด. "
+
+    for name, block in [("ข้อความปกติ", clean_block), ("ข้อความหลบคำ", dirty_block)]:
+        for size_kb in (50, 200, 500):
+            page = block * (size_kb * 1024 // len(block.encode("utf-8")))
+            runs = 5
+
+            started = time.perf_counter()
+            for _ in range(runs):
+                normalize(page)
+            norm_ms = (time.perf_counter() - started) / runs * 1000
+
+            started = time.perf_counter()
+            for _ in range(runs):
+                check_exaggeration(page)
+            total_ms = (time.perf_counter() - started) / runs * 1000
+
+            print(f"{name:<12} {size_kb:>4} KB | normalize {norm_ms:7.2f} ms | "
+                  f"scan ทั้งหมด {total_ms:8.2f} ms | สัดส่วน {norm_ms / total_ms:5.1%}")
@@ -1,4 +1,16 @@
+import hashlib
+import json
+import os
 import re
+import sys
+import threading
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+
+from models import RULES, RULES_BY_KEYWORD, Rule, SentenceHit, register_rule
+from normalize import normalize
 
 # ==============================================================================
 # 📚 1. ฐานข้อมูลคำต้องห้าม (Knowledge Base)
@@ -10,14 +22,11 @@ import re
 GUARANTEE_KEYWORDS = {
     "หายขาด": "ห้ามใช้คำว่าหายขาด เพราะไม่มีผลิตภัณฑ์ใดรับประกันผลได้ 100%",
     "หายถาวร": "การระบุว่าถาวร เป็นคำโฆษณาที่เกินจริงทางการแพทย์",
-    "100%": "การระบุตัวเลข 100% เป็นการยืนยันผลลัพธ์ที่เป็นเท็จ",
-    "เปอร์เซ็นต์": "หากใช้ในบริบทการยืนยันผลลัพธ์ (เช่น หาย 100 เปอร์เซ็นต์) ถือว่าผิดกฎ",
     "การันตี": "ห้ามใช้คำว่าการันตีผลลัพธ์ในการรักษาหรือบำบัด",
     "รับรองผล": "ห้ามรับรองผลการรักษา",
     "เห็นผลจริง": "เป็นคำยืนยันที่พิสูจน์ได้ยากทางวิทยาศาสตร์",
     "เห็นผลทันที": "ร่างกายมนุษย์ต้องใช้เวลาฟื้นฟู การบอกว่าทันทีคือเกินจริง",
-    "ภายใน 3 วัน": "ห้ามระบุระยะเวลาที่ชัดเจนเกินไปในการเห็นผล (เช่น 3 วัน, 7 วัน)",
-    "ภายใน 7 วัน": "ห้ามระบุระยะเวลาที่ชัดเจนเกินไปในการเห็นผล",
+    # ตัวเลข % และระยะเวลา (เช่น 100%, ภายใน 7 วัน) ย้ายไปเป็น Pattern ในหมวด 1.5
 }
 
 # 1.2 หมวดสรรพคุณทางการแพทย์ (ถ้าไม่ใช่ยา ห้ามใช้) -> Violation
@@ -65,10 +74,63 @@ ALL_RULES = {
     **BEAUTY_KEYWORDS
 }
 
+# 1.5 หมวดรูปแบบตัวเลข/แม่แบบ (Pattern Rules) -> ใช้ Regex แทนการเขียนทีละคำ
+# เช่น "ภายใน 5 วัน", "99%", "หาย 100 เปอร์เซ็นต์", "ลด 5 โล ใน 7 วัน"
+# รูปแบบ: ชื่อที่แสดง -> (regex, เหตุผล, ระดับหมวด, นับเป็นผิดกฎชัดเจนตอนคิดคะแนนไหม)
+# *หมายเหตุ* ห้ามใช้วงเล็บแบบจับกลุ่ม (...) ใน regex ให้ใช้ (?:...) แทน
+#  และใช้ [^\S\n] แทน \s เพื่อไม่ให้ข้ามบรรทัด (ข้ามประโยค)
+_NUMBER = r'\d+(?:[.,]\d+)?'
+_SPACE = r'[^\S\n]*'
+_PERCENT = r'(?:%|เปอร์เซ็นต์|เปอร์เซนต์|เปอร์เซ็น)'
+_DAYS = r'(?:วัน|สัปดาห์|อาทิตย์|เดือน|ชั่วโมง|ชม\.?)'
+# เปอร์เซ็นต์ที่เป็นเรื่องราคา/ภาษี ไม่ใช่การอ้างผลลัพธ์ (เช่น "ส่วนลด 50%", "ราคารวม VAT 7%")
+# lookbehind ต้องยาวคงที่ จึงเขียนแยกทีละคำ ทั้งแบบติดกันและเว้นวรรค 1 ช่อง
+_NOT_RESULT_WORDS = ("ลด", "ลดราคา", "ลดถึง", "ลดสูงสุด", "ภาษี", "ภาษีมูลค่าเพิ่ม", "ดอกเบี้ย",
+                     "(?i:vat)", "(?i:off)", "(?i:sale)")
+_NOT_RESULT = "".join(rf'(?<!{w})(?<!{w} )' for w in _NOT_RESULT_WORDS)
+PATTERN_RULES = {
+    "ลด N กิโล ใน M วัน": (
+        rf'(?:ลด|หาย){_SPACE}(?:น้ำหนัก)?{_SPACE}{_NUMBER}{_SPACE}(?:กิโลกรัม|กิโล|กก\.?|kg|โล)'
+        rf'{_SPACE}(?:ภายใน|ใน){_SPACE}{_NUMBER}{_SPACE}{_DAYS}',
+        "ห้ามระบุผลการลดน้ำหนักเป็นตัวเลขพร้อมระยะเวลา ถือเป็นการรับรองผลเกินจริง",
+        'violation', True,
+    ),
+    "100%": (
+        rf'(?<![\d.,])100(?:\.0+)?{_SPACE}{_PERCENT}',
+        "การระบุตัวเลข 100% (หรือ 100 เปอร์เซ็นต์) เป็นการยืนยันผลลัพธ์ที่เป็นเท็จ",
+        'violation', True,
+    ),
+    "N%": (
+        rf'{_NOT_RESULT}(?<![\d.,]){_NUMBER}{_SPACE}{_PERCENT}',
+        "การระบุผลลัพธ์เป็นเปอร์เซ็นต์ต้องมีผลวิจัยรองรับ หากใช้ยืนยันผลถือว่าผิดกฎ",
+        'risk', False,   # เสี่ยง (ต้องดูบริบท) ไม่ใช่ผิดกฎชัดเจนเหมือน 100%
+    ),
+    "ภายใน N วัน": (
+        rf'ภายใน{_SPACE}{_NUMBER}{_SPACE}{_DAYS}',
+        "ห้ามระบุระยะเวลาที่ชัดเจนเกินไปในการเห็นผล (เช่น 3 วัน, 7 วัน)",
+        'violation', False,
+    ),
+}
+
+# หมวดของ Pattern Rules ในรายงาน (audit.rule_category) -> ทั้งหมดเคยอยู่ในหมวดการันตีผล (1.1)
+PATTERN_CATEGORIES = {
+    "ลด N กิโล ใน M วัน": "guarantee",
+    "100%": "guarantee",
+    "N%": "guarantee",
+    "ภายใน N วัน": "guarantee",
+}
+
+# คำต้องห้ามร้ายแรงที่ใช้ตัดสิน "ผิดกฎชัดเจน" ตอนคำนวณคะแนน (main.calculate_ad_score)
+# ถ้าคำที่เจอมีคำเหล่านี้ผสมอยู่ ประโยคนั้นนับเป็น Violation (สีแดง)
+# (ตัวเลข 100% อยู่ใน PATTERN_RULES แล้ว)
+VIOLATION_KEYWORDS = ["รักษา", "หายขาด", "บำบัด", "ป้องกันโรค", "รับรองผล", "การันตี", "เห็นผลจริง"]
+
 # ==============================================================================
 # ⚙️ 2. ฟังก์ชันช่วย (Utility Functions)
 # ==============================================================================
 
+_SENTENCE_SEPARATOR = re.compile(r'[\n.!?]+|\s{2,}')
+
 def split_sentences(text: str):
     """
     ฟังก์ชันแยกประโยค (Sentence Tokenizer)
@@ -81,10 +143,48 @@ def split_sentences(text: str):
            - ช่องว่างหลายๆ ช่องติดกัน (  ) ซึ่งมักใช้แทนการเว้นวรรคประโยคในภาษาไทย
     """
     # ใช้ Regex ตัดคำตามเงื่อนไขข้างบน
-    sentences = re.split(r'[\n.!?]+|\s{2,}', text)
+    sentences = _SENTENCE_SEPARATOR.split(text)
     # กรองเอาเฉพาะประโยคที่มีตัวหนังสือจริงๆ (ไม่เอาประโยคว่างเปล่า)
     return [s.strip() for s in sentences if s.strip()]
 
+def split_sentence_spans(text: str, protected=()):
+    """
+    เหมือน split_sentences แต่คืนค่าเป็นตำแหน่ง (start, end) ในข้อความต้นฉบับ
+    ใช้สำหรับเก็บผลตรวจแบบ offset โดยไม่ต้องก๊อปข้อความประโยค
+    protected: ช่วง (start, end) ที่ห้ามตัดกลาง เรียงตามตำแหน่งและไม่ทับกัน
+               (ผลของ Pattern Rules เช่น "99.9%", "5 กก. ใน 7 วัน", "ภายใน  7 วัน")
+               ตัวคั่นที่อยู่ในช่วงเหล่านี้จะไม่ถูกนับเป็นจุดจบประโยค
+    """
+    spans = []
+    pos = 0
+    j = 0
+    for sep in _SENTENCE_SEPARATOR.finditer(text):
+        sep_start, sep_end = sep.span()
+        # เลื่อนจุดเริ่มตัวคั่นออกจากช่วงที่ห้ามตัด (เช่น "." ท้าย "ชม." เป็นส่วนหนึ่งของคำ)
+        while True:
+            while j < len(protected) and protected[j][1] <= sep_start:
+                j += 1
+            if j < len(protected) and protected[j][0] <= sep_start:
+                sep_start = protected[j][1]
+                continue
+            break
+        # ตัวคั่นที่ลากเข้าไปในช่วงถัดไป ให้จบก่อนช่วงนั้น
+        if j < len(protected) and protected[j][0] < sep_end:
+            sep_end = protected[j][0]
+        if sep_start >= sep_end:
+            continue
+        _append_stripped_span(text, pos, sep_start, spans)
+        pos = sep_end
+    _append_stripped_span(text, pos, len(text), spans)
+    return spans
+
+def _append_stripped_span(text: str, start: int, end: int, spans: list):
+    chunk = text[start:end]
+    stripped = chunk.strip()
+    if stripped:
+        offset = start + chunk.index(stripped)
+        spans.append((offset, offset + len(stripped)))
+
 def get_risk_level(word: str) -> str:
     """
     ฟังก์ชันประเมินระดับความรุนแรง (Severity Check)
@@ -96,56 +196,412 @@ def get_risk_level(word: str) -> str:
         return 'violation'  # ผิดกฎ อย. ชัดเจน
     return 'risk'           # แค่โฆษณาเกินจริง (ปรับปรุงได้)
 
+# ลงทะเบียนกฎทุกข้อในตารางกลาง (models.RULES) ครั้งเดียวตอนโหลดโมดูล
+# ผลตรวจจะอ้างถึงกฎด้วยเลข id แทนการก๊อปข้อความเหตุผลไปทุกประโยค
+for _keyword, _reason in ALL_RULES.items():
+    register_rule(
+        _keyword,
+        _reason,
+        get_risk_level(_keyword),
+        any(k in _keyword for k in VIOLATION_KEYWORDS),
+    )
+
+# Pattern Rules: ลงทะเบียนแบบมี regex (keyword เป็นแค่ชื่อที่แสดง)
+PATTERN_RULE_LIST = [
+    register_rule(_label, _reason, _severity, _score_violation, re.compile(_regex))
+    for _label, (_regex, _reason, _severity, _score_violation) in PATTERN_RULES.items()
+]
+
+# ==============================================================================
+# 📒 2.1 สมุดกฎ (Rulebooks) แยกตามประเภทสินค้า
+# ==============================================================================
+# แต่ละคำขอเลือกได้ว่าจะตรวจด้วยสมุดกฎไหน (เลือกได้หลายเล่ม)
+# ชุดกฎที่เลือกจะถูก "คอมไพล์" (รวม regex) ครั้งเดียวแล้วเก็บ cache ไว้
+# โดยใช้ key = (เวอร์ชันของกฎ, ชื่อสมุดกฎที่เลือก) -> แก้ rules.json แล้ว cache เก่าจะไม่ถูกใช้อีก
+
+RULES_JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+
+def _ids(*keyword_dicts) -> tuple[int, ...]:
+    keywords = {k for d in keyword_dicts for k in d}
+    return tuple(rule.id for rule in RULES if rule.keyword in keywords)
+
+_PATTERN_IDS = tuple(rule.id for rule in PATTERN_RULE_LIST)
+
+RULEBOOK_LABELS = {
+    "supplements": "อาหารเสริม (อย.)",
+    "cosmetics": "เครื่องสำอาง (อย.)",
+    "insurance": "ประกันภัย/ประกันชีวิต (คปภ.)",
+}
+RULEBOOKS = {
+    "supplements": _ids(GUARANTEE_KEYWORDS, MEDICAL_KEYWORDS, EXAGGERATION_KEYWORDS) + _PATTERN_IDS,
+    "cosmetics": _ids(GUARANTEE_KEYWORDS, MEDICAL_KEYWORDS, EXAGGERATION_KEYWORDS, BEAUTY_KEYWORDS) + _PATTERN_IDS,
+    "insurance": (),   # โหลดจาก rules.json (ดู _refresh_json_rulebook)
+}
+# ไม่ระบุสมุดกฎ = ตรวจกฎ อย. ทั้งหมด (เหมือนพฤติกรรมเดิมก่อนมีสมุดกฎ)
+DEFAULT_RULEBOOKS = ("supplements", "cosmetics")
+
+_json_mtime = None
+_rules_version = None
+_matcher_cache = {}
+_rulebook_lock = threading.Lock()
+
+def _refresh_json_rulebook():
+    """
+    โหลดกฎประกันจาก rules.json ใหม่ถ้าไฟล์ถูกแก้ไข
+    กฎแต่ละข้อ (เช่น INS-01) กลายเป็น Pattern Rule 1 ข้อ ที่รวมทุก keyword ของมันไว้
+    ระดับ high = ผิดกฎชัดเจน, อื่นๆ = เสี่ยง
+    """
+    global _json_mtime, _rules_version
+    try:
+        mtime = os.path.getmtime(RULES_JSON_PATH)
+    except OSError:
+        mtime = None
+    if mtime == _json_mtime and _rules_version is not None:
+        return
+
+    with _rulebook_lock:
+        if mtime != _json_mtime or _rules_version is None:
+            ids = []
+            if mtime is not None:
+                with open(RULES_JSON_PATH, encoding="utf-8") as f:
+                    for item in json.load(f)["rules"]:
+                        is_high = item.get("risk") == "high"
+                        rule = register_rule(
+                            item["id"],
+                            item["reason"],
+                            'violation' if is_high else 'risk',
+                            is_high,
+                            re.compile("|".join(re.escape(k) for k in item["keywords"])),
+                        )
+                        ids.append(rule.id)
+            RULEBOOKS["insurance"] = tuple(ids)
+            _json_mtime = mtime
+            version = _compute_rules_version()
+            if version != _rules_version:
+                _matcher_cache.clear()  # Matcher ของเวอร์ชันเก่าไม่มีใครใช้อีกแล้ว
+            _rules_version = version
+
+def _compute_rules_version() -> str:
+    """ลายนิ้วมือของกฎทุกเล่ม (เปลี่ยนเมื่อคำ/เหตุผล/regex/สมาชิกของสมุดกฎเปลี่ยน)"""
+    h = hashlib.blake2b(digest_size=8)
+    for name in sorted(RULEBOOKS):
+        h.update(name.encode("utf-8"))
+        for rule_id in RULEBOOKS[name]:
+            rule = RULES[rule_id]
+            pattern = rule.pattern.pattern if rule.pattern else ""
+            h.update(f"\0{rule.keyword}\0{rule.reason}\0{rule.severity}\0{rule.score_violation}\0{pattern}".encode("utf-8"))
+    return h.hexdigest()
+
+@dataclass(slots=True, frozen=True)
+class Matcher:
+    """
+    ชุดกฎที่คอมไพล์แล้วสำหรับสมุดกฎ 1 ชุด
+    - rules: กฎทั้งหมดในชุด (ใช้กับ scan_sentence ตอนตรวจทีละประโยค)
+    - literal_rules: กฎคำตรงตัว (หาด้วย str.find ทีละประโยค)
+    - patterns: Pattern Rules ของแต่ละสมุดกฎรวมเป็น regex ก้อนเดียว (?P<r12>...)|(?P<r13>...)|...
+      สแกนข้อความรอบเดียวต่อก้อน แล้วดูชื่อกลุ่มว่าตรงกับกฎไหน
+      (แยกก้อนตามสมุดกฎ เพราะ regex ก้อนเดียวกันรายงานได้แค่กฎแรกที่ตรงในแต่ละตำแหน่ง
+       เช่น "ประกันนี้ได้ผล 100%" ต้องได้ทั้ง INS-01 และ 100% เมื่อเลือกสองเล่มพร้อมกัน)
+    - rulebooks: ชื่อสมุดกฎที่ใช้สร้าง (ส่งให้ worker สร้าง Matcher เดียวกันเองในโหมดเอกสารยาว)
+    - version: เวอร์ชันของกฎตอนสร้าง (ผลที่จำไว้จากเวอร์ชันอื่นห้ามยืมมาใช้)
+    """
+    rules: tuple[Rule, ...]
+    literal_rules: tuple[Rule, ...]
+    patterns: tuple[re.Pattern, ...]
+    rulebooks: tuple[str, ...] = ()
+    version: str = ""
+
+def get_matcher(rulebooks=None) -> Matcher:
+    """คืน Matcher ของสมุดกฎที่เลือก (คอมไพล์ครั้งแรก ครั้งต่อไปดึงจาก cache)"""
+    _refresh_json_rulebook()
+    names = tuple(sorted(set(rulebooks or DEFAULT_RULEBOOKS)))
+    unknown = [n for n in names if n not in RULEBOOKS]
+    if unknown:
+        raise ValueError(f"ไม่รู้จักสมุดกฎ: {', '.join(unknown)}")
+
+    version = _rules_version
+    key = (version, names)
+    matcher = _matcher_cache.get(key)
+    if matcher is None:
+        rule_ids = sorted({rule_id for n in names for rule_id in RULEBOOKS[n]})
+        rules = [RULES[i] for i in rule_ids]
+        # สมุดกฎที่มี Pattern Rules ชุดเดียวกัน (เช่น supplements กับ cosmetics) ใช้ regex ก้อนเดียวกัน
+        groups = []
+        for n in names:
+            group = tuple(sorted(i for i in RULEBOOKS[n] if RULES[i].pattern is not None))
+            if group and group not in groups:
+                groups.append(group)
+        matcher = Matcher(
+            tuple(rules),
+            tuple(rule for rule in rules if rule.pattern is None),
+            tuple(
+                re.compile("|".join(f"(?P<r{i}>{RULES[i].pattern.pattern})" for i in group))
+                for group in groups
+            ),
+            names,
+            version,
+        )
+        if version == _rules_version:  # กฎถูกโหลดใหม่ระหว่างคอมไพล์ -> ใช้ครั้งเดียว ไม่เก็บ cache
+            _matcher_cache[key] = matcher
+    return matcher
+
+def find_rule(keyword: str):
+    """หากฎจากคำ/ชื่อกฎ (เช่น "หายขาด", "INS-01") ถ้ามีหลายเวอร์ชันใช้ตัวล่าสุด"""
+    _refresh_json_rulebook()
+    return RULES_BY_KEYWORD.get(keyword)
+
+_refresh_json_rulebook()
+
 # ==============================================================================
 # 🚀 3. ฟังก์ชันหลัก (Core Logic)
 # ==============================================================================
 
-def check_exaggeration(text: str):
+def split_with_patterns(text: str, matcher: Matcher):
+    """
+    สแกน Pattern Rules ด้วย regex ก้อนรวม (Matcher.patterns ก้อนละรอบ แล้วรวมผล) "ก่อน" ตัดประโยค
+    แล้วตัดประโยคโดยไม่หั่นกลางคำที่เจอ (ตัวเลขทศนิยม, กก., ชม., เว้นวรรคซ้อน ยังอยู่ในประโยคเดียว)
+    คืนค่า: (ตำแหน่งประโยค, {ลำดับประโยค: [(rule_id, start, end), ...]})
+    """
+    if not matcher.patterns:
+        return split_sentence_spans(text), {}
+    matches = sorted(
+        {(int(m.lastgroup[1:]), m.start(), m.end()) for pattern in matcher.patterns for m in pattern.finditer(text)},
+        key=lambda match: (match[1], match[0]),
+    )
+    # ผลจากต่างก้อนอาจทับกัน -> รวมเป็นช่วงที่ไม่ทับกันก่อนส่งให้ตัวตัดประโยค
+    protected = []
+    for _, start, end in matches:
+        if protected and start < protected[-1][1]:
+            protected[-1] = (protected[-1][0], max(protected[-1][1], end))
+        else:
+            protected.append((start, end))
+    sentence_spans = split_sentence_spans(text, protected)
+
+    found = {}
+    starts = [start for start, _ in sentence_spans]
+    for match in matches:
+        idx = bisect_right(starts, match[1]) - 1
+        if idx >= 0:
+            found.setdefault(idx, []).append(match)
+    return sentence_spans, found
+
+def scan_sentence(text: str, start: int, end: int, rules=RULES, pattern_matches=()):
+    """
+    ตรวจประโยคเดียว (text[start:end]) กับกฎที่กำหนด (ค่าเริ่มต้น: ทุกกฎ)
+    - กฎคำตรงตัว: หาด้วย str.find
+    - กฎ Pattern: ใช้ pattern_matches (ผลจาก split_with_patterns) เท่านั้น
+      ไม่ค้น regex ทีละข้อ เพราะผลจะต่างจาก regex ก้อนรวม (ตำแหน่งเดียวกันนับได้ 2 กฎ)
+    คืนค่า SentenceHit ถ้าเจอคำผิด หรือ None ถ้าผ่าน
+    """
+    sentence = text[start:end]
+    found = {}  # rule_id -> (start, end) ตำแหน่งแรกที่เจอ
+
+    # วนลูปเช็คคำศัพท์ทุกคำในฐานข้อมูล (เรียงตามลำดับใน ALL_RULES)
+    for rule in rules:
+        if rule.pattern is None:
+            pos = sentence.find(rule.keyword)
+            if pos >= 0:
+                found[rule.id] = (start + pos, start + pos + len(rule.keyword))
+
+    for rule_id, m_start, m_end in pattern_matches:
+        found.setdefault(rule_id, (m_start, m_end))
+
+    if not found:
+        return None
+    rule_ids = tuple(sorted(found))
+    spans = tuple(pos for rule_id in rule_ids for pos in found[rule_id])
+    violation = any(RULES[rule_id].score_violation for rule_id in rule_ids)
+    return SentenceHit(text, start, end, rule_ids, spans, violation)
+
+def scan_clean_text(clean: str, matcher: Matcher):
+    """
+    สแกนข้อความที่ล้างแล้ว (normalize แล้ว) ด้วย Matcher ที่กำหนด
+    คืนค่า list[SentenceHit] ที่ตำแหน่งยังอ้างอิงข้อความที่ล้างแล้ว
+    ข้อความยาวเกิน LARGE_DOC_THRESHOLD จะแบ่งสแกนหลาย process พร้อมกัน (ดูหัวข้อที่ 4)
+    """
+    if len(clean) >= LARGE_DOC_THRESHOLD and LARGE_DOC_WORKERS > 1:
+        return _scan_clean_text_parallel(clean, matcher)
+    return _scan_clean_text_serial(clean, matcher)
+
+def _scan_clean_text_serial(clean: str, matcher: Matcher):
+    return _scan_sentence_spans(clean, *split_with_patterns(clean, matcher), matcher)
+
+def _scan_sentence_spans(clean: str, sentence_spans, pattern_hits, matcher: Matcher):
+    bad_sentences = []
+
+    # วนลูปเช็คทีละประโยค
+    for idx, (start, end) in enumerate(sentence_spans):
+        hit = scan_sentence(clean, start, end, matcher.literal_rules, pattern_hits.get(idx, ()))
+        # ถ้าเจอคำผิดในประโยคนั้น ให้บันทึกลง list
+        if hit:
+            bad_sentences.append(hit)
+    return bad_sentences
+
+def check_exaggeration(text: str, rulebooks=None):
     """
     ฟังก์ชันตรวจสอบโฆษณาเกินจริง (Main Scanner)
     ------------------------------------------
-    Input: ข้อความโฆษณา (str)
-    Output: (is_bad: bool, results: list)
+    Input: ข้อความโฆษณา (str), สมุดกฎที่เลือก (เช่น ["cosmetics"]; None = กฎ อย. ทั้งหมด)
+    Output: (is_bad: bool, results: list[SentenceHit])
     
     หน้าที่:
-    1. รับข้อความเข้ามา แล้วแยกเป็นประโยค
-    2. วนลูปเช็คทีละประโยคว่ามีคำต้องห้ามในฐานข้อมูลไหม
-    3. ถ้าเจอ ให้บันทึกว่าเจอคำว่าอะไร, ผิดเพราะอะไร, และรุนแรงแค่ไหน
+    0. ล้างเทคนิคหลบคำ (ตัวอักษรล่องหน, เว้นวรรคทีละตัว, เลขเต็มความกว้าง) ดู normalize.py
+    1. สแกน Pattern Rules ทั้งข้อความรอบเดียว
+    2. แยกเป็นประโยค (เก็บเป็นตำแหน่ง start/end) โดยไม่ตัดกลางคำจากข้อ 1 แล้วแจกผลไปตามประโยค
+    3. วนลูปเช็คทีละประโยคว่ามีคำต้องห้ามในฐานข้อมูลไหม แล้วรวมกับผลจากข้อ 2
+    4. ถ้าเจอ ให้บันทึกเลขกฎ + ตำแหน่งคำที่เจอ + ระดับความรุนแรง
+       (ตำแหน่งถูกแปลงกลับไปชี้ที่ข้อความต้นฉบับ, เหตุผลดึงจากตารางกฎตอนแสดงผล)
     """
 
+    norm = normalize(text)
+    hits = scan_clean_text(norm.text, get_matcher(rulebooks))
+    # แปลงตำแหน่งกลับไปอ้างอิงข้อความต้นฉบับ
+    bad_sentences = [norm.remap_hit(hit) for hit in hits]
+
+    # คืนค่ากลับไป (True ถ้าเจอคำผิด, รายละเอียดคำผิด)
+    return bool(bad_sentences), bad_sentences
+
+
+# ==============================================================================
+# 🧵 4. โหมดเอกสารยาว (Large-document Mode)
+# ==============================================================================
+# หน้าเว็บยาวหลายร้อย KB (บทความโฆษณา, กระทู้) ถ้าสแกนบนเธรดของ request จะกิน CPU นาน
+# และ GIL ทำให้ผู้ใช้คนอื่นรอไปด้วย -> แบ่งข้อความเป็นก้อน (chunk) แล้วสแกนหลาย process พร้อมกัน
+#
+# - ตัดก้อนเฉพาะ "หลังตัวคั่นประโยค" ที่ไม่อยู่ในคำที่ Pattern Rule จับได้ ประโยคจึงไม่ถูกหั่นกลาง
+# - แต่ละก้อนส่งข้อความก่อนหน้าไปด้วย _CHUNK_OVERLAP ตัว ให้ regex เริ่มสแกนจากตรงนั้น
+#   (ตำแหน่ง match ตรงกับการสแกนรวดเดียว) แล้วนับเฉพาะประโยคที่เริ่มในก้อนของตัวเอง
+# - worker สร้าง Matcher เองจากชื่อสมุดกฎ แล้วส่งกลับเป็น "คำในฐานข้อมูล" ไม่ใช่เลข id
+#   (เลข id ของกฎใน rules.json ใน process แม่กับ worker อาจไม่ตรงกันหลังแก้ไฟล์)
+# - จำกัดความยาวสูงสุดด้วย cap_text (ส่วนที่เกินไม่ถูกตรวจ)
+
+LARGE_DOC_THRESHOLD = int(os.environ.get("LARGE_DOC_THRESHOLD", "200000"))   # ตัวอักษร (ยาวกว่านี้ใช้หลาย process)
+LARGE_DOC_CHUNK_CHARS = int(os.environ.get("LARGE_DOC_CHUNK_CHARS", "50000"))  # ขนาดก้อนขั้นต่ำ
+LARGE_DOC_MAX_CHARS = int(os.environ.get("LARGE_DOC_MAX_CHARS", "2000000"))   # ตรวจไม่เกินเท่านี้ต่อเอกสาร
+LARGE_DOC_WORKERS = int(os.environ.get("LARGE_DOC_WORKERS", str(min(4, os.cpu_count() or 1))))
+_CHUNK_OVERLAP = 256  # ยาวกว่า match ของ Pattern Rule ใดๆ มากพอ
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    """สร้าง process pool ครั้งแรกที่ต้องใช้ (spawn: ไม่ fork จาก process ที่มีหลายเธรดอย่าง uvicorn)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=LARGE_DOC_WORKERS, mp_context=get_context("spawn"))
+        return _pool
+
+def cap_text(text: str, max_chars: int = LARGE_DOC_MAX_CHARS) -> tuple[str, bool]:
+    """
+    ตัดข้อความให้ยาวไม่เกิน max_chars (พยายามตัดที่ท้ายประโยค)
+    คืนค่า: (ข้อความ, ถูกตัดหรือไม่)
+    """
+    if len(text) <= max_chars:
+        return text, False
+    cut = max(text.rfind(sep, 0, max_chars) for sep in "\n.!?") + 1
+    if cut < max_chars // 2:
+        cut = max_chars  # ไม่มีจุดจบประโยคใกล้ๆ ตัดตรงๆ
+    return text[:cut], True
+
+def split_chunks(text: str, chunk_chars: int, patterns=()) -> list[tuple[int, int]]:
+    """
+    แบ่งข้อความเป็นช่วง (start, end) ยาวประมาณ chunk_chars ตัดหลังตัวคั่นประโยคเท่านั้น
+    ถ้าส่ง patterns มา จะข้ามตัวคั่นที่อยู่ในคำที่ pattern จับได้ (เช่น "." ใน "99.9%")
+    """
+    chunks = []
+    pos = 0
+    search_from = pos + chunk_chars
+    while len(text) - pos > chunk_chars:
+        sep = _SENTENCE_SEPARATOR.search(text, search_from)
+        if sep is None:
+            break
+        if any(
+            m.start() < sep.end() and m.end() > sep.start()
+            for pattern in patterns
+            for m in pattern.finditer(text, max(0, sep.start() - _CHUNK_OVERLAP), sep.end() + _CHUNK_OVERLAP)
+        ):
+            search_from = sep.end()
+            continue
+        chunks.append((pos, sep.end()))
+        pos = sep.end()
+        search_from = pos + chunk_chars
+    if pos < len(text):
+        chunks.append((pos, len(text)))
+    return chunks
+
+def _scan_chunk(segment: str, lead: int, offset: int, rulebooks: tuple[str, ...]):
+    """
+    (ทำงานใน worker) สแกน 1 ก้อน: segment = ข้อความก่อนหน้า lead ตัว + ตัวก้อน, offset = ตำแหน่งของ segment
+    คืนผลเป็น tuple ล้วน (ไม่ส่งข้อความกลับ ประหยัดการ pickle)
+    """
+    matcher = get_matcher(rulebooks)
+    spans, pattern_hits = split_with_patterns(segment, matcher)
+    first = bisect_left(spans, (lead,))  # ประโยคแรกที่เริ่มในก้อนนี้
+    pattern_hits = {idx - first: found for idx, found in pattern_hits.items() if idx >= first}
+    hits = _scan_sentence_spans(segment, spans[first:], pattern_hits, matcher)
+    return [
+        (hit.start + offset, hit.end + offset, tuple(hit.keywords), tuple(pos + offset for pos in hit.spans))
+        for hit in hits
+    ]
+
+def _scan_clean_text_parallel(clean: str, matcher: Matcher):
+    chunk_chars = max(LARGE_DOC_CHUNK_CHARS, len(clean) // (LARGE_DOC_WORKERS * 2) + 1)
+    chunks = split_chunks(clean, chunk_chars, matcher.patterns)
+    if len(chunks) == 1:
+        return _scan_clean_text_serial(clean, matcher)
+
+    pool = _get_pool()
+    futures = []
+    for start, end in chunks:
+        lead_start = max(0, start - _CHUNK_OVERLAP)
+        futures.append(pool.submit(
+            _scan_chunk, clean[lead_start:end], start - lead_start, lead_start, matcher.rulebooks
+        ))
+    ids_by_keyword = {rule.keyword: rule.id for rule in matcher.rules}
+
     bad_sentences = []
-    sentences = split_sentences(text)
-    
-    # วนลูปเช็คทีละประโยค
-    for sentence in sentences:
-        found_words = []
-        reasons = []
-        risk_categories = []
-        
-        # วนลูปเช็คคำศัพท์ทุกคำในฐานข้อมูล (ALL_RULES)
-        for keyword, reason in ALL_RULES.items():
-            if keyword in sentence:
-                found_words.append(keyword)
-                reasons.append(reason)
-                
-                # เช็คระดับความรุนแรงเพื่อจัดหมวดหมู่
-                severity = get_risk_level(keyword)
-                risk_label = "ผิดกฎร้ายแรง" if severity == 'violation' else "โฆษณาเกินจริง"
-                risk_categories.append(risk_label)
+    for future in futures:
+        for start, end, keywords, spans in future.result():
+            # แปลงคำกลับเป็นเลขกฎของ process นี้ (เรียงตามเลขกฎเหมือน scan_sentence)
+            pairs = sorted((ids_by_keyword[k], spans[2 * i:2 * i + 2]) for i, k in enumerate(keywords))
+            rule_ids = tuple(rule_id for rule_id, _ in pairs)
+            violation = any(RULES[rule_id].score_violation for rule_id in rule_ids)
+            bad_sentences.append(SentenceHit(
+                clean, start, end, rule_ids, tuple(pos for _, span in pairs for pos in span), violation
+            ))
+    return bad_sentences
 
-        # ถ้าเจอคำผิดในประโยคนั้น ให้บันทึกลง list
-        if found_words:
-            # ลบคำซ้ำ (เผื่อเจอ rule ซ้อนกัน)
-            risk_categories = list(set(risk_categories))
-            
-            bad_sentences.append({
-                "sentence": sentence,          # ประโยคที่ผิด
-                "words": found_words,          # คำที่ผิด (เช่น "หายขาด")
-                "reasons": reasons,            # เหตุผล (เช่น "อย. ห้ามรับรองผล")
-                "risk_categories": risk_categories, # ประเภทความผิด
-                # *สำคัญ* เราไม่ได้ใส่ key 'severity' ตรงนี้ 
-                # เพราะ main.py จะคำนวณใหม่จาก words เอง (หรือจะใส่ไปเลยก็ได้ แต่ main.py ล่าสุดมี logic เช็คซ้ำอยู่แล้ว)
-            })
 
-    # คืนค่ากลับไป (True ถ้าเจอคำผิด, รายละเอียดคำผิด)
-    return bool(bad_sentences), bad_sentences
\ No newline at end of file
+# ==============================================================================
+# ✅ ตรวจสอบตัวอย่าง: python rules.py
+# ==============================================================================
+# รูปแบบที่ผู้ขายเขียนจริง (ทศนิยม, ตัวย่อมีจุด, เว้นวรรคซ้อน) ต้องถูกจับได้ครบ
+
+if __name__ == "__main__":
+    cases = [
+        ("ได้ผล 99.9%", "N%", "99.9%"),
+        ("2.5%", "N%", "2.5%"),
+        ("ลดน้ำหนัก 5 กก. ใน 7 วัน", "ลด N กิโล ใน M วัน", "ลดน้ำหนัก 5 กก. ใน 7 วัน"),
+        ("เห็นผลภายใน 24 ชม.", "ภายใน N วัน", "ภายใน 24 ชม."),
+        ("ภายใน  7 วัน", "ภายใน N วัน", "ภายใน  7 วัน"),
+        ("ขาวใสใน 7 วัน. ได้ผล 100.0% แน่นอน", "100%", "100.0%"),
+        # เปอร์เซ็นต์เรื่องราคา/ภาษี ต้องไม่โดน (keyword = None)
+        ("โปรโมชั่นส่วนลด 50%", None, None),
+        ("ราคารวม VAT 7%", None, None),
+        ("SALE 30%", None, None),
+    ]
+    failed = 0
+    for text, keyword, word in cases:
+        _, hits = check_exaggeration(text)
+        found = [(k, w) for hit in hits for k, w in zip(hit.keywords, hit.words)]
+        ok = (keyword, word) in found if keyword else not found
+        failed += not ok
+        print(f"{'✅' if ok else '❌'} {text!r} -> {found}")
+    # เลือกหลายสมุดกฎพร้อมกัน ต้องได้ผลรวมของทุกเล่ม (ตำแหน่งเดียวกันนับได้ทั้งสองกฎ)
+    _, hits = check_exaggeration("ประกันนี้ได้ผล 100%", ["insurance", "supplements"])
+    found = sorted(k for hit in hits for k in hit.keywords)
+    ok = "100%" in found and any(k.startswith("INS-") for k in found)
+    print(f"{'✅' if ok else '❌'} insurance + supplements -> {found}")
+    failed += not ok
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,157 @@
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+# ==============================================================================
+# 🧮 SCORING ENGINE (สูตรคำนวณคะแนน แยกจาก main.py)
+# ==============================================================================
+# ใช้ได้ 2 แบบ:
+# 1. score_from_counts -> ทีละเอกสาร (main.calculate_ad_score เรียกใช้)
+# 2. score_batch       -> ทีละหลายแสนเอกสารด้วย NumPy (ใช้ตอนปรับน้ำหนักแล้วคิดคะแนนย้อนหลัง)
+# ทั้งสองแบบคำนวณลำดับเดียวกันทุกขั้น ผลลัพธ์จึงตรงกันทุกบิต
+
+
+@dataclass(frozen=True)
+class ScoreWeights:
+    """ตัวคูณบทลงโทษ (Penalty Multiplier) ที่ปรับได้"""
+    risk: float = 1.5           # ผิด 10% หัก 15 คะแนน
+    violation: float = 5.0      # ผิด 10% หัก 50 คะแนน
+    violation_cap: int = 49     # มีผิดกฎชัดเจนแม้แต่จุดเดียว คะแนนไม่เกินนี้
+
+
+DEFAULT_WEIGHTS = ScoreWeights()
+
+
+def score_from_counts(sentence_count: int, count_risk: int, count_violation: int,
+                      weights: ScoreWeights = DEFAULT_WEIGHTS) -> dict:
+    """
+    คำนวณคะแนนจากจำนวนนับ (ไม่ต้องสแกนข้อความใหม่)
+    sentence_count: จำนวนประโยคทั้งหมด (หรือค่า 'total' ที่เคยคำนวณไว้ก็ได้ ผลเท่ากัน)
+    """
+    total_sentences = max(1, sentence_count)  # ป้องกันการหารด้วย 0
+
+    # กันเหนียวเผื่อตัดประโยคผิดพลาด (ไม่ให้ติดลบ)
+    total_bad = count_violation + count_risk
+    if total_bad > total_sentences:
+        total_sentences = total_bad
+
+    count_pass = max(0, total_sentences - total_bad)
+
+    # หักคะแนนตาม "ความหนาแน่น" (Density)
+    risk_ratio = count_risk / total_sentences
+    violation_ratio = count_violation / total_sentences
+    deduction = (risk_ratio * 100 * weights.risk) + (violation_ratio * 100 * weights.violation)
+    score = 100 - deduction
+
+    # 🔒 กฎเหล็ก (Safety Cap): ผิดกฎหมาย 1 จุด = สอบตกทันที
+    if count_violation > 0:
+        score = min(score, weights.violation_cap)
+
+    score = max(0, int(score))  # ปัดเศษเป็นจำนวนเต็มและห้ามติดลบ
+
+    return {
+        "score": score,
+        "total": total_sentences,
+        "pass": count_pass,
+        "risk": count_risk,
+        "violation": count_violation
+    }
+
+
+def score_batch(sentence_counts, risk_counts, violation_counts,
+                weights: ScoreWeights = DEFAULT_WEIGHTS) -> dict:
+    """
+    เวอร์ชัน Vectorized ของ score_from_counts (รับ array ต่อเอกสาร คืน array ต่อเอกสาร)
+    ลำดับการคูณ/หารเหมือนเวอร์ชันปกติทุกขั้น (float64) ผลลัพธ์จึงตรงกันทุกบิต
+    """
+    sentences = np.asarray(sentence_counts, dtype=np.int64)
+    risk = np.asarray(risk_counts, dtype=np.int64)
+    violation = np.asarray(violation_counts, dtype=np.int64)
+
+    total_bad = violation + risk
+    total = np.maximum(np.maximum(sentences, 1), total_bad)
+    count_pass = np.maximum(total - total_bad, 0)
+
+    risk_ratio = risk / total
+    violation_ratio = violation / total
+    deduction = (risk_ratio * 100 * weights.risk) + (violation_ratio * 100 * weights.violation)
+    score = 100 - deduction
+
+    score = np.where(violation > 0, np.minimum(score, weights.violation_cap), score)
+    score = np.maximum(np.trunc(score), 0).astype(np.int64)
+
+    return {
+        "score": score,
+        "total": total,
+        "pass": count_pass,
+        "risk": risk,
+        "violation": violation
+    }
+
+
+# ==============================================================================
+# 💾 เก็บจำนวนนับไว้คิดคะแนนย้อนหลัง (Re-scoring)
+# ==============================================================================
+
+def counts_from_stats(stats_list) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """แปลงผล calculate_ad_score หลายรายการ (list หรือ iterator ก็ได้) เป็น array (total, risk, violation)"""
+    rows = np.array([(s["total"], s["risk"], s["violation"]) for s in stats_list], dtype=np.int64).reshape(-1, 3)
+    return rows[:, 0].copy(), rows[:, 1].copy(), rows[:, 2].copy()
+
+
+def save_counts(path: str, total, risk, violation):
+    """บันทึกจำนวนนับเป็นไฟล์ .npz (บีบอัด)"""
+    np.savez_compressed(path, total=total, risk=risk, violation=violation)
+
+
+def counts_from_audit(start: str | None = None, end: str | None = None,
+                      domain: str | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    ดึงจำนวนนับ (total, risk, violation) ของทุกการตรวจจากบันทึก audit (audit_data/*.ndjson.gz)
+    start/end: YYYY-MM-DD (ไม่ระบุ = ทุกวันที่มีบันทึก)
+    """
+    import audit  # import ตอนใช้ (โมดูลนี้ใช้เดี่ยวๆ ได้โดยไม่ต้องโหลดกฎ)
+
+    audit.flush()  # รวมรายการที่ยังค้างใน buffer ด้วย
+    return counts_from_stats(audit.iter_records(start, end, domain))
+
+
+def export_audit_counts(path: str, start: str | None = None, end: str | None = None,
+                        domain: str | None = None) -> int:
+    """บันทึกจำนวนนับจากบันทึก audit เป็นไฟล์ .npz (ใช้กับ rescore_file) คืนค่าจำนวนเอกสาร"""
+    total, risk, violation = counts_from_audit(start, end, domain)
+    save_counts(path, total, risk, violation)
+    return len(total)
+
+
+def rescore_file(path: str, weights: ScoreWeights = DEFAULT_WEIGHTS) -> dict:
+    """โหลดจำนวนนับจากไฟล์ .npz แล้วคิดคะแนนใหม่ โดยไม่ต้องสแกนข้อความซ้ำ"""
+    with np.load(path) as data:
+        return score_batch(data["total"], data["risk"], data["violation"], weights)
+
+
+# python scoring.py counts.npz [risk] [violation] [cap]
+# python scoring.py export counts.npz [เริ่ม] [สิ้นสุด]   (สร้างไฟล์จำนวนนับจากบันทึก audit)
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("วิธีใช้: python scoring.py counts.npz [risk=1.5] [violation=5.0] [cap=49]")
+        print("        python scoring.py export counts.npz [เริ่ม YYYY-MM-DD] [สิ้นสุด YYYY-MM-DD]")
+        sys.exit(1)
+    if sys.argv[1] == "export":
+        if len(sys.argv) < 3:
+            print("วิธีใช้: python scoring.py export counts.npz [เริ่ม YYYY-MM-DD] [สิ้นสุด YYYY-MM-DD]")
+            sys.exit(1)
+        n = export_audit_counts(sys.argv[2],
+                                sys.argv[3] if len(sys.argv) > 3 else None,
+                                sys.argv[4] if len(sys.argv) > 4 else None)
+        print(f"✅ บันทึกจำนวนนับ {n} รายการลง {sys.argv[2]}")
+        sys.exit(0)
+    w = ScoreWeights(
+        risk=float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_WEIGHTS.risk,
+        violation=float(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_WEIGHTS.violation,
+        violation_cap=int(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_WEIGHTS.violation_cap,
+    )
+    scores = rescore_file(sys.argv[1], w)["score"]
+    print(f"📊 เอกสาร {len(scores)} รายการ | คะแนนเฉลี่ย {scores.mean():.2f}")
+    print(f"   ✅ >= 80: {(scores >= 80).sum()} | ⚠️ 50-79: {((scores >= 50) & (scores < 80)).sum()} | ❌ < 50: {(scores < 50).sum()}")
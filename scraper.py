@@ -1,6 +1,8 @@
+import os
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Comment
 import re
+from urllib.parse import urlsplit
 
 # ----------------------------
 # ตั้งค่า Header ให้เหมือน Browser จริง (กันโดนบล็อก)
@@ -10,16 +12,33 @@ HEADERS = {
     "Accept-Language": "th-TH,th;q=0.9,en;q=0.8"
 }
 
-def scrape_text(url: str) -> str:
+# ----------------------------
+# (ทางเลือก) เปลี่ยนทุก URL ให้ไปดึงจาก Stub Site Server แทนเว็บจริง
+# เช่น SCRAPER_BASE_URL=http://127.0.0.1:8102 -> https://shop.com/p/1 จะดึงจาก http://127.0.0.1:8102/p/1
+# ใช้ตอน Load Test ในเครื่อง (ดู loadtest/stub_site.py)
+# ----------------------------
+SCRAPER_BASE_URL = os.environ.get("SCRAPER_BASE_URL")
+
+# แท็กที่ถือเป็น "ย่อหน้า/บล็อก" ของเนื้อหา (ใช้แบ่งบล็อกใน scrape_blocks)
+BLOCK_TAGS = {
+    "p", "li", "h1", "h2", "h3", "h4", "h5", "h6", "div", "section", "article", "main", "body",
+    "td", "th", "dt", "dd", "blockquote", "pre", "figcaption", "caption", "label", "button", "option",
+}
+
+def _fetch_soup(url: str):
     """
-    ดึงข้อความจาก URL โดยตัดส่วนเกิน (Script, Style, Menu) ออก
-    เพื่อให้ได้เฉพาะ "เนื้อหาโฆษณา" จริงๆ
+    ดึงหน้าเว็บแล้วตัดส่วนเกิน (Script, Style, Menu) ออก
+    คืนค่า BeautifulSoup หรือ None ถ้าดึงไม่ได้
     """
-    
+
     # 1. ตรวจสอบ URL เบื้องต้น
     if not url.startswith("http"):
         url = "https://" + url
 
+    if SCRAPER_BASE_URL:
+        parts = urlsplit(url)
+        url = SCRAPER_BASE_URL.rstrip("/") + (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
     try:
         # 2. ยิง Request ไปหาเว็บไซต์
         res = requests.get(url, headers=HEADERS, timeout=10)
@@ -39,15 +58,57 @@ def scrape_text(url: str) -> str:
         for tag in soup(unwanted_tags):
             tag.decompose() # ลบ tag นั้นทิ้งไปเลย
 
-        # 6. ดึงข้อความออกมา
-        text = soup.get_text(separator=" ")
-
-        # 7. จัดระเบียบข้อความ (ลบช่องว่างเยอะๆ, ลบ Newline ว่างๆ)
-        # เปลี่ยนช่องว่างหลายอันให้เหลืออันเดียว
-        clean_text = re.sub(r'\s+', ' ', text).strip()
-
-        return clean_text
+        return soup
 
     except requests.exceptions.RequestException as e:
         print(f"❌ Error fetching URL: {e}")
-        return "" # คืนค่าว่างถ้าดึงไม่ได้ กันโปรแกรมพัง
\ No newline at end of file
+        return None
+
+def scrape_text(url: str) -> str:
+    """
+    ดึงข้อความจาก URL โดยตัดส่วนเกิน (Script, Style, Menu) ออก
+    เพื่อให้ได้เฉพาะ "เนื้อหาโฆษณา" จริงๆ
+    """
+    soup = _fetch_soup(url)
+    if soup is None:
+        return "" # คืนค่าว่างถ้าดึงไม่ได้ กันโปรแกรมพัง
+
+    # 6. ดึงข้อความออกมา
+    text = soup.get_text(separator=" ")
+
+    # 7. จัดระเบียบข้อความ (ลบช่องว่างเยอะๆ, ลบ Newline ว่างๆ)
+    # เปลี่ยนช่องว่างหลายอันให้เหลืออันเดียว
+    clean_text = re.sub(r'\s+', ' ', text).strip()
+
+    return clean_text
+
+def scrape_blocks(url: str) -> list[str]:
+    """
+    เหมือน scrape_text แต่คืนค่าเป็นรายการ "บล็อก" ตามโครงสร้างหน้าเว็บ (p/li/div/หัวข้อ ฯลฯ)
+    ข้อความไทยมักไม่มี . ! ? คั่นประโยค แบ่งตามแท็กจึงได้บล็อกเล็กและคงที่กว่า
+    (แก้ราคา/ยอดวิวในบล็อกหนึ่ง บล็อกอื่นยังมี hash เดิม)
+    """
+    soup = _fetch_soup(url)
+    if soup is None:
+        return []
+
+    blocks = []
+    current_owner = None
+    current_parts = []
+    # ไล่ข้อความทุกชิ้นตามลำดับในหน้า แล้วรวมชิ้นที่อยู่ในบล็อกเดียวกัน (บล็อกที่ใกล้ที่สุด) ติดกัน
+    for node in soup.find_all(string=True):
+        if isinstance(node, Comment) or node.parent.name in ("[document]", "html", "head", "title"):
+            continue
+        owner = next((parent for parent in node.parents if parent.name in BLOCK_TAGS), None)
+        if owner is not current_owner:
+            _append_block(current_parts, blocks)
+            current_owner = owner
+            current_parts = []
+        current_parts.append(str(node))
+    _append_block(current_parts, blocks)
+    return blocks
+
+def _append_block(parts: list[str], blocks: list[str]):
+    block = re.sub(r'\s+', ' ', " ".join(parts)).strip()
+    if block:
+        blocks.append(block)